@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""End-to-end benchmark of the dependency analysis on synthetic projects.
+
+Generates projects of increasing size with make_project.py
+and times each phase of DependencyAnalysis and Graph.analyze separately
+with the profile of the analysis phases:
+
+    config: loading and validation of the configuration file,
+    setup: the gathering of include directories, aliases, and patterns,
+    discover: the search and pairing of component files,
+    scan: the search of include directives in source files,
+    construct: the construction of components,
+    locate: the resolution of included headers,
+    quotient: the aggregation of package and group dependencies,
+    graph: the construction of graphs,
+    scc, condense, reduce: the phases of Graph.analyze,
+    report: the text report,
+    dot: the DOT files.
+
+The results are printed as a table
+and can be saved as a JSON file (a record per project)
+to compare with the results of other revisions.
+
+    $ python benchmark/bench_analysis.py -o results.json
+    $ python benchmark/bench_analysis.py --compare results.json
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import argparse as ap
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from cppdep import cppdep, profiling
+from make_project import generate
+
+PROJECTS = [
+    ('small', dict(groups=1, packages=4, components=50)),
+    ('medium', dict(groups=2, packages=10, components=100)),
+    ('large', dict(groups=4, packages=10, components=250, fanout=4)),
+    ('cyclic', dict(groups=2, packages=10, components=100, cycles=0.2)),
+    ('deep', dict(groups=1, packages=4, components=500, depth=500)),
+]
+
+# The order of phases in the report.
+PHASES = [
+    'config', 'setup', 'discover', 'scan', 'construct', 'locate', 'quotient',
+    'graph', 'scc', 'condense', 'reduce', 'report', 'dot'
+]
+
+
+def measure(config_file, work_dir):
+    """Runs the analysis of the project and returns the phase profile."""
+    args = ap.Namespace(
+        l=False,
+        L=False,
+        format='text',
+        graph_format=['dot'],
+        dot_ranks=False,
+        dot_clusters=False)
+    report = []
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        profile = profiling.enable()
+        start = time.time()
+        analysis = cppdep.DependencyAnalysis(config_file)
+        analysis.analyze(lambda *x: report.append(x), args)
+        total = time.time() - start
+    finally:
+        profiling.disable()
+        os.chdir(cwd)
+    num_components = sum(1 for _ in analysis.internal_components)
+    num_edges = sum(
+        len(x.dependencies()) for x in analysis.internal_components)
+    return profile, total, num_components, num_edges
+
+
+def run(projects, repeat):
+    """Times the analysis of each project.
+
+    Returns:
+        [record] with the project parameters, sizes, and the best times (s).
+    """
+    records = []
+    for name, parameters in projects:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            config_file = generate(os.path.join(tmp_dir, 'project'),
+                                   **parameters)
+            work_dir = os.path.join(tmp_dir, 'output')
+            os.mkdir(work_dir)
+            profile, total, num_components, num_edges = min(
+                (measure(config_file, work_dir) for _ in range(repeat)),
+                key=lambda x: x[1])
+        finally:
+            shutil.rmtree(tmp_dir)
+        records.append({
+            'project': name,
+            'parameters': parameters,
+            'components': num_components,
+            'edges': num_edges,
+            'total': total,
+            'phases': dict((x, profile.phases.get(x, [0.0, 0])[0])
+                           for x in PHASES),
+            'calls': dict((x, profile.phases.get(x, [0.0, 0])[1])
+                          for x in PHASES),
+        })
+    return records
+
+
+def print_records(records, baseline=None):
+    """Prints the records as a table of phase times (ms).
+
+    Args:
+        records: The benchmark records.
+        baseline: {project: record} to print speedups against.
+    """
+    columns = ['total'] + PHASES
+    print('%-8s %7s %7s ' % ('project', 'comps', 'edges') +
+          ' '.join('%9s' % x for x in columns))
+    for record in records:
+        times = [record['total']] + [record['phases'][x] for x in PHASES]
+        print('%-8s %7d %7d ' % (record['project'], record['components'],
+                                 record['edges']) +
+              ' '.join('%9.1f' % (1000 * x) for x in times))
+        reference = (baseline or {}).get(record['project'])
+        if reference:
+            old_times = [reference['total']] + [
+                reference['phases'].get(x, 0) for x in PHASES
+            ]
+            print('%-8s %15s ' % ('', 'speedup') + ' '.join(
+                '%8.2fx' % (old / new) if new and old else '%9s' % '-'
+                for old, new in zip(old_times, times)))
+
+
+def main():
+    """Runs the benchmark with the command-line options."""
+    parser = ap.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        'projects',
+        nargs='*',
+        metavar='project',
+        help='the projects to analyze (%s; all by default)' % ', '.join(
+            x for x, _ in PROJECTS))
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3, help='the number of runs')
+    parser.add_argument(
+        '-o', '--output', metavar='path', help='a JSON file for the results')
+    parser.add_argument(
+        '--compare', metavar='path', help='a JSON file with earlier results')
+    args = parser.parse_args()
+    unknown = set(args.projects) - set(x for x, _ in PROJECTS)
+    if unknown:
+        parser.error('unknown projects: %s' % ', '.join(sorted(unknown)))
+    projects = [x for x in PROJECTS
+                if not args.projects or x[0] in args.projects]
+    records = run(projects, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as json_file:
+            baseline = dict((x['project'], x)
+                            for x in json.load(json_file)['records'])
+    print_records(records, baseline)
+    if args.output:
+        with open(args.output, 'w') as json_file:
+            json.dump({
+                'version': cppdep.VERSION,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'records': records
+            }, json_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of writing analyzed graphs into DOT files.
+
+Compares the built-in writer (Graph.write_dot)
+against the export of the NetworkX graph with pydot
+on the random acyclic graphs of the graph analysis benchmark.
+
+    $ python benchmark/bench_dot.py
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import os
+import shutil
+import sys
+import tempfile
+
+from networkx.drawing.nx_pydot import write_dot
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from cppdep.graph import Graph
+from bench_graph import make_dag, measure
+
+
+def run():
+    """Times the DOT export for each graph size."""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('%-8s %-8s %10s %10s %10s %10s' % ('nodes', 'edges', 'pydot (s)',
+                                                 '(MB)', 'native (s)', '(MB)'))
+        for num_nodes in (1000, 5000, 20000):
+            edges = make_dag(num_nodes)
+            graph = Graph([])
+            graph.add_edges_from(edges)
+            graph.analyze()
+            pydot_path = os.path.join(tmp_dir, 'pydot.dot')
+            row = [num_nodes, len(edges)]
+            for function, args in (
+                    (lambda x: write_dot(graph.to_networkx(), x),
+                     (pydot_path,)),
+                    (graph.write_dot, (os.path.join(tmp_dir, 'native'),))):
+                _, duration, peak_memory = measure(function, *args)
+                row += [
+                    '%.3f' % duration,
+                    '-' if peak_memory is None else '%.1f' % peak_memory
+                ]
+            with open(pydot_path) as pydot_file:
+                with open(os.path.join(tmp_dir, 'native.dot')) as native_file:
+                    assert sorted(pydot_file) == sorted(native_file)
+            print('%-8d %-8d %10s %10s %10s %10s' % tuple(row))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    run()
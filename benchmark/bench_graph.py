@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the graph analysis algorithms.
+
+Compares the analysis of Graph (transitive reduction, levels, and CCD)
+against the reduction of a NetworkX graph
+with a depth-first search from every successor
+and the CCD calculation with memoized sets of descendants
+on random acyclic dependency graphs
+with the average out-degree of 4 and mostly local dependencies.
+The peak memory is reported with tracemalloc (Python 3).
+
+    $ python benchmark/bench_graph.py
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import os
+import random
+import sys
+import time
+
+import networkx as nx
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None  # pylint: disable=invalid-name
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from cppdep.graph import Graph
+
+_MAX_REFERENCE_NODES = 2000  # The reference is too slow or big for more.
+
+
+def make_dag(num_nodes, out_degree=4, seed=42):
+    """Returns edges of a random acyclic graph like component dependencies."""
+    rand = random.Random(seed)
+    edges = set()
+    for u in range(1, num_nodes):
+        for _ in range(min(u, out_degree)):
+            edges.add((u, u - 1 - int(rand.expovariate(1 / 20)) % u))
+    return sorted(edges)
+
+
+def transitive_reduction_dfs(digraph):
+    """The reduction with a search from every successor of every node."""
+    for u in digraph:
+        transitive_vertex = []
+        for v in digraph[u]:
+            transitive_vertex.extend(x for _, x in nx.dfs_edges(digraph, v))
+        digraph.remove_edges_from((u, x) for x in transitive_vertex)
+
+
+def calculate_ccd_sets(digraph):
+    """The CCD calculation with a set of descendants for every node."""
+    descendants = {}
+
+    def _get_descendants(node):
+        if node not in descendants:
+            node_descendants = set()
+            for v in digraph[node]:
+                node_descendants.add(v)
+                node_descendants.update(_get_descendants(v))
+            descendants[node] = node_descendants
+        return descendants[node]
+
+    return sum(1 + len(_get_descendants(x)) for x in digraph)
+
+
+def measure(function, *args):
+    """Returns the result, time (s), and peak memory (MB) of the call."""
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    result = function(*args)
+    duration = time.time() - start
+    peak_memory = None
+    if tracemalloc:
+        peak_memory = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, duration, peak_memory
+
+
+def analyze_reference(digraph):
+    """The reference reduction and CCD calculation on a NetworkX graph."""
+    transitive_reduction_dfs(digraph)
+    return calculate_ccd_sets(digraph)
+
+
+def run():
+    """Times the graph analysis for each graph size."""
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * 10000))
+    print('%-8s %-8s %14s %10s %10s %10s' % ('nodes', 'edges', 'reference (s)',
+                                             '(MB)', 'graph (s)', '(MB)'))
+    for num_nodes in (500, 1000, 2000, 5000, 20000):
+        edges = make_dag(num_nodes)
+        graph = Graph([])
+        graph.add_edges_from(edges)
+        _, duration, peak_memory = measure(graph.analyze)
+        row = [num_nodes, len(edges), '-', '-', '%.3f' % duration,
+               '-' if peak_memory is None else '%.1f' % peak_memory]
+        if num_nodes <= _MAX_REFERENCE_NODES:
+            reference = nx.DiGraph(edges)
+            ccd, duration, peak_memory = measure(analyze_reference, reference)
+            row[2] = '%.3f' % duration
+            if peak_memory is not None:
+                row[3] = '%.1f' % peak_memory
+            assert set(graph.to_networkx().edges()) == set(reference.edges())
+            assert ccd == sum(graph.node2cd.values())
+        print('%-8d %-8d %14s %10s %10s %10s' % tuple(row))
+
+
+if __name__ == '__main__':
+    run()
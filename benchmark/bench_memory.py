@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the memory retained by the analysis per component.
+
+Measures the memory allocated with tracemalloc (Python 3)
+and retained by DependencyAnalysis after the construction of components
+on projects generated with make_project.py,
+with and without the release of include directives.
+
+    $ python benchmark/bench_memory.py
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from cppdep.cppdep import DependencyAnalysis
+from make_project import generate
+
+
+def measure(config_file, release_includes):
+    """Returns the number of components and the retained memory (bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    analysis = DependencyAnalysis(
+        config_file, release_includes=release_includes)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return sum(1 for _ in analysis.internal_components), memory
+
+
+def run():
+    """Reports the retained memory per component for each project size."""
+    print('%-10s %14s %14s %8s' % ('components', 'kept (B/comp)',
+                                   'released', 'saving'))
+    for components in (100, 500, 2500):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            config_file = generate(
+                os.path.join(tmp_dir, 'project'),
+                groups=2,
+                packages=10,
+                components=components // 20,
+                fanout=4)
+            measure(config_file, True)  # Import the configuration libraries.
+            num_components, kept = measure(config_file, False)
+            _, released = measure(config_file, True)
+        finally:
+            shutil.rmtree(tmp_dir)
+        print('%-10d %14.0f %14.0f %7.0f%%' %
+              (num_components, kept / num_components,
+               released / num_components, 100 * (1 - released / kept)))
+
+
+if __name__ == '__main__':
+    run()
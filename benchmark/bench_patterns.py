@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the header matching with external package patterns.
+
+Compares the combined PatternMatcher
+against the linear search over the regexes of every package
+for increasing numbers of packages with 3 patterns each.
+
+    $ python benchmark/bench_patterns.py
+"""
+
+from __future__ import print_function, absolute_import
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from cppdep.cppdep import PatternMatcher
+
+
+def make_patterns(num_packages):
+    """Returns (package, [pattern]) with typical library patterns."""
+    return [('lib%d' % i, [
+        r'lib%d/' % i, r'lib%d_\w+\.h$' % i, r'(?:ext%d|tool%d)/' % (i, i)
+    ]) for i in range(num_packages)]
+
+
+def make_headers(num_packages, num_headers=1000):
+    """Returns header names matching random packages or nothing."""
+    return [
+        'lib%d/header.h' % (i * 7919 % num_packages) if i % 2 else
+        'internal/header_%d.h' % i for i in range(num_headers)
+    ]
+
+
+def linear_match(include_patterns, hfile):
+    """The search over the regexes of every package in order."""
+    for package, patterns in include_patterns:
+        if any(x.match(hfile) for x in patterns):
+            return package
+    return None
+
+
+def run(repeat=5):
+    """Times the matching of headers for each number of packages."""
+    print('%-10s %12s %14s %8s' % ('packages', 'linear (ms)', 'combined (ms)',
+                                   'speedup'))
+    for num_packages in (1, 10, 100, 1000):
+        patterns = make_patterns(num_packages)
+        compiled = [(x, [re.compile(z) for z in y]) for x, y in patterns]
+        matcher = PatternMatcher(patterns)
+        headers = make_headers(num_packages)
+        assert ([linear_match(compiled, x) for x in headers] ==
+                [matcher.match(x) for x in headers])
+
+        def _time(match):
+            return 1000 * min(
+                timeit.repeat(
+                    lambda: [match(x) for x in headers],
+                    number=1,
+                    repeat=repeat))
+
+        linear_time = _time(lambda x: linear_match(compiled, x))
+        combined_time = _time(matcher.match)
+        print('%-10d %12.3f %14.3f %7.1fx' % (num_packages, linear_time,
+                                              combined_time,
+                                              linear_time / combined_time))
+
+
+if __name__ == '__main__':
+    run()
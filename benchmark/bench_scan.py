@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the include directive search in source files.
+
+Compares the binary whole-file search (Include.grep)
+against the reference line-by-line search in text mode.
+
+    $ python benchmark/bench_scan.py
+"""
+
+from __future__ import print_function, absolute_import
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from cppdep.cppdep import Include  # pylint: disable=wrong-import-position
+
+_INCLUDES = ''.join('#include "dir/header_%d.h"\n' % i for i in range(30))
+_CODE = ''.join('    int value_%d = compute(%d);  // comment\n' % (i, i)
+                for i in range(100))
+_TABLE = ''.join('  {%d, %d, %d, %d},\n' % (i, i + 1, i + 2, i + 3)
+                 for i in range(1000))
+
+SOURCES = [
+    ('typical (30 includes, 3K lines)', _INCLUDES + _CODE * 30),
+    ('generated (30 includes, 5 MB)', _INCLUDES + _TABLE * 200),
+    ('no includes (3K lines)', _CODE * 30),
+]
+
+
+def run(repeat=5):
+    """Times the search in each kind of source files."""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('%-35s %12s %12s %8s' % ('source', 'lines (ms)', 'bytes (ms)',
+                                       'speedup'))
+        for name, text in SOURCES:
+            path = os.path.join(tmp_dir, 'source.cc')
+            with open(path, 'w') as src_file:
+                src_file.write(text)
+            assert ([str(x) for x in Include.grep(path)] ==
+                    [str(x) for x in Include._grep_lines(path)])
+
+            def _time(grep):
+                return 1000 * min(
+                    timeit.repeat(
+                        lambda: list(grep(path)), number=1, repeat=repeat))
+
+            lines_time = _time(Include._grep_lines)
+            bytes_time = _time(Include.grep)
+            print('%-35s %12.3f %12.3f %7.1fx' % (name, lines_time, bytes_time,
+                                                  lines_time / bytes_time))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    run()
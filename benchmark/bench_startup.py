@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the command-line startup on a tiny project.
+
+Times the whole cppdep process
+without and with the validated configuration in the cache directory.
+
+    $ python benchmark/bench_startup.py
+"""
+
+from __future__ import print_function, absolute_import
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+_CONFIG = """
+internal:
+    - name: project
+      path: %(root)s/src
+      packages:
+          - name: pkg
+            src: [pkg]
+            include: [.]
+"""
+
+
+def run(repeat=5):
+    """Times the cppdep process startup with and without the cache."""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(tmp_dir, 'src', 'pkg'))
+        with open(os.path.join(tmp_dir, 'src', 'pkg', 'a.h'), 'w') as src:
+            src.write('#include <vector>\n')
+        config = os.path.join(tmp_dir, '.cppdep.yml')
+        with open(config, 'w') as config_file:
+            config_file.write(_CONFIG % {'root': tmp_dir})
+        env = dict(os.environ)
+        env['PYTHONPATH'] = _ROOT
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        command = [
+            sys.executable, '-m', 'cppdep', '-c', config, '-o',
+            os.path.join(tmp_dir, 'report.txt')
+        ]
+
+        devnull = open(os.devnull, 'w')
+
+        def _time(*args):
+            return 1000 * min(
+                timeit.repeat(
+                    lambda: subprocess.check_call(
+                        command + list(args),
+                        env=env,
+                        cwd=tmp_dir,
+                        stdout=devnull,
+                        stderr=devnull),
+                    number=1,
+                    repeat=repeat))
+
+        print('%-35s %12s' % ('run', 'time (ms)'))
+        print('%-35s %12.1f' % ('--version', _time('--version')))
+        print('%-35s %12.1f' % ('no cache', _time()))
+        _time('--cache-dir', cache_dir)  # Warm up.
+        print('%-35s %12.1f' % ('cached config', _time('--cache-dir',
+                                                       cache_dir)))
+        devnull.close()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    run()
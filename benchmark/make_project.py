@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Generator of synthetic C/C++ projects for benchmarks.
+
+The project consists of package groups of packages of components
+(a header and an implementation file) with the configuration file.
+Components are numbered across the project in the order of groups,
+and dependencies mostly go to the preceding components:
+
+    - each component depends on the previous one in chains of the given depth,
+    - each component includes 'fanout' random preceding components,
+      mostly the nearest ones,
+    - a 'cycles' fraction of components include a following component
+      and close dependency cycles,
+    - every component includes a header of the external package group.
+
+    $ python benchmark/make_project.py /path/to/project --components 500
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import argparse as ap
+import os
+import random
+
+_CONFIG_HEADER = 'internal:\n'
+_GROUP_CONFIG = """\
+    - name: %(group)s
+      path: %(root)s/src/%(group)s
+      packages:
+"""
+_PACKAGE_CONFIG = """\
+          - name: %(package)s
+            src: [%(package)s]
+            include: [%(package)s]
+"""
+_EXTERNAL_CONFIG = """\
+external:
+    - name: external
+      path: %(root)s/external
+      packages:
+          - name: ext
+            include: [include]
+"""
+_EXTERNAL_HEADERS = 16
+_BODY = ''.join('int function_%d(int x) { return x * %d; }\n' % (i, i)
+                for i in range(20))
+
+
+def _component_name(index, num_packages, num_components):
+    """Returns the group, package, and component names of the component."""
+    package = index // num_components
+    return ('g%d' % (package // num_packages),
+            'g%d_p%d' % (package // num_packages, package % num_packages),
+            'c%d' % index)
+
+
+def generate(root,
+             groups=2,
+             packages=4,
+             components=50,
+             fanout=3,
+             depth=10,
+             cycles=0.01,
+             seed=42):
+    """Writes the synthetic project and its configuration file.
+
+    Args:
+        root: The root directory of the project.
+        groups: The number of internal package groups.
+        packages: The number of packages per group.
+        components: The number of components per package.
+        fanout: The number of random dependencies of each component.
+        depth: The length of dependency chains of consecutive components.
+        cycles: The fraction of components with a dependency on
+            a following component.
+        seed: The seed of the random generator.
+
+    Returns:
+        The path to the configuration file.
+    """
+    rand = random.Random(seed)
+    num_components = groups * packages * components
+    names = [
+        _component_name(i, packages, components) for i in range(num_components)
+    ]
+    for group, package, _ in names[::components]:
+        os.makedirs(os.path.join(root, 'src', group, package))
+    ext_dir = os.path.join(root, 'external', 'include')
+    os.makedirs(ext_dir)
+    for i in range(_EXTERNAL_HEADERS):
+        with open(os.path.join(ext_dir, 'ext%d.h' % i), 'w') as ext_file:
+            ext_file.write('#pragma once\n')
+
+    for i, (group, package, name) in enumerate(names):
+        deps = set()
+        if i % depth:
+            deps.add(i - 1)
+        for _ in range(min(i, fanout)):
+            deps.add(i - 1 - int(rand.expovariate(1 / 20)) % i)
+        if i + 1 < num_components and rand.random() < cycles:
+            deps.add(rand.randrange(i + 1, min(i + depth, num_components)))
+        includes = ''.join('#include <%s.h>\n' % names[x][2]
+                           for x in sorted(deps))
+        includes += '#include <ext%d.h>\n' % (i % _EXTERNAL_HEADERS)
+        path = os.path.join(root, 'src', group, package, name)
+        with open(path + '.h', 'w') as header:
+            header.write(includes + 'int %s(int x);\n' % name)
+        with open(path + '.cc', 'w') as source:
+            source.write('#include "%s.h"\n\n#include <ext%d.h>\n\n%s' %
+                         (name, (i + 1) % _EXTERNAL_HEADERS, _BODY))
+
+    config = [_CONFIG_HEADER]
+    for group_index in range(groups):
+        config.append(_GROUP_CONFIG % {
+            'group': 'g%d' % group_index,
+            'root': root
+        })
+        for package_index in range(packages):
+            config.append(_PACKAGE_CONFIG % {
+                'package': 'g%d_p%d' % (group_index, package_index)
+            })
+    config.append(_EXTERNAL_CONFIG % {'root': root})
+    config_path = os.path.join(root, '.cppdep.yml')
+    with open(config_path, 'w') as config_file:
+        config_file.write(''.join(config))
+    return config_path
+
+
+def main():
+    """Generates the project with the command-line parameters."""
+    parser = ap.ArgumentParser(
+        description=__doc__.split('\n')[0],
+        formatter_class=ap.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('root', help='the root directory of the project')
+    parser.add_argument('--groups', type=int, default=2)
+    parser.add_argument('--packages', type=int, default=4, help='per group')
+    parser.add_argument('--components', type=int, default=50,
+                        help='per package')
+    parser.add_argument('--fanout', type=int, default=3)
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--cycles', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(generate(args.root, args.groups, args.packages, args.components,
+                   args.fanout, args.depth, args.cycles, args.seed))
+
+
+if __name__ == '__main__':
+    main()
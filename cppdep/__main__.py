@@ -20,13 +20,11 @@
 from __future__ import print_function, absolute_import
 
 import argparse as ap
+import json
 import logging
 import sys
 
-from yaml import YAMLError
-from pykwalify.core import SchemaError
-
-from cppdep import cppdep
+from cppdep import cppdep, profiling
 
 
 def main(argv=None):
@@ -55,6 +53,55 @@ def main(argv=None):
         default=False,
         help='list unreduced dependencies of nodes')
     parser.add_argument('-o', '--output', metavar='path', help='output file')
+    parser.add_argument(
+        '--format',
+        choices=['text', 'jsonl'],
+        default='text',
+        help='the report format (jsonl: a JSON record per graph on a line)')
+    parser.add_argument(
+        '--graph-format',
+        nargs='+',
+        choices=['dot', 'npz'],
+        default=['dot'],
+        help='the formats of graph files '
+        '(npz: NumPy arrays of node columns and edge lists)')
+    parser.add_argument(
+        '--dot-ranks',
+        action='store_true',
+        default=False,
+        help='place nodes of the same level at the same rank in DOT graphs')
+    parser.add_argument(
+        '--dot-clusters',
+        action='store_true',
+        default=False,
+        help='place nodes of cycles into clusters in DOT graphs')
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='the number of parallel jobs')
+    parser.add_argument(
+        '--cache-dir',
+        metavar='path',
+        help='a directory to keep results between runs')
+    parser.add_argument(
+        '--fs-fallback',
+        action='store_true',
+        default=False,
+        help='check the filesystem for headers missing in the directory index')
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='',
+        metavar='path',
+        help='print times and counters of the analysis phases '
+        '(and write them into a JSON file)')
+    parser.add_argument(
+        '--trace',
+        metavar='path',
+        help='write spans of the analysis into a Chrome trace-event JSON file')
     args = parser.parse_args(argv)
     if args.version:
         print(cppdep.VERSION)
@@ -65,14 +112,27 @@ def main(argv=None):
         sys.exit(1)
 
     try:
-        analysis = cppdep.DependencyAnalysis(args.config)
-        printer = get_printer(args.output)
+        if args.profile is not None:
+            profiling.enable()
+        if args.trace:
+            profiling.enable_trace()
+        analysis = cppdep.DependencyAnalysis(
+            args.config,
+            args.jobs,
+            args.cache_dir,
+            args.fs_fallback,
+            release_includes=True)
+        printer = get_printer(args.output, flush=args.format == 'jsonl')
         analysis.analyze(printer, args)
+        if args.profile is not None:
+            report_profile(profiling.disable(), args.profile)
+        if args.trace:
+            profiling.disable_trace().write(args.trace)
     except IOError as err:
         _die('IO Error', err)
-    except YAMLError as err:
+    except cppdep.MalformedConfigError as err:
         _die('Malformed Configuration File', err)
-    except SchemaError as err:
+    except cppdep.InvalidConfigError as err:
         _die('Configuration File Validity Error', err)
     except cppdep.InvalidArgumentError as err:
         _die('Invalid Argument Error', err)
@@ -80,15 +140,35 @@ def main(argv=None):
         _die('Analysis (Configuration) Error', err)
 
 
-def get_printer(file_path=None):
-    """Returns printer for the report."""
+def get_printer(file_path=None, flush=False):
+    """Returns printer for the report.
+
+    Args:
+        file_path: The output file path instead of the standard output.
+        flush: Flush the output after each print.
+    """
     destination = open(file_path, 'w') if file_path else sys.stdout
 
     def _print(*args):
         print(*args, file=destination)
+        if flush:
+            destination.flush()
 
     return _print
 
 
+def report_profile(profile, file_path=None):
+    """Prints the profile table into the standard error.
+
+    Args:
+        profile: The profile of the analysis.
+        file_path: The path to the JSON file for the profile.
+    """
+    profile.print_table(lambda *x: print(*x, file=sys.stderr))
+    if file_path:
+        with open(file_path, 'w') as json_file:
+            json.dump(profile.to_dict(), json_file, indent=2)
+
+
 if __name__ == "__main__":
     main()
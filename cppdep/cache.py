@@ -0,0 +1,210 @@
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Persistent cache of results from processing source files.
+
+The cache is kept between runs in a JSON file
+to skip reprocessing of unchanged files.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+_replace = getattr(os, 'replace', os.rename)  # pylint: disable=invalid-name
+
+
+def content_digest(content):
+    """Returns the hex digest of the binary content."""
+    return hashlib.sha1(content).hexdigest()
+
+
+def file_digest(file_path, num_bytes=None):
+    """Returns the hex digest of the file content.
+
+    Args:
+        file_path: The path to the file.
+        num_bytes: The number of bytes to digest from the file start
+            instead of the whole file.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as src_file:
+        if num_bytes is not None:
+            digest.update(src_file.read(num_bytes))
+        else:
+            for block in iter(lambda: src_file.read(1 << 16), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_value(cache_file, stamp):
+    """Loads the value saved with the same stamp.
+
+    Args:
+        cache_file: The path to the cache file.
+        stamp: The JSON-compatible version stamp of the value.
+
+    Returns:
+        The saved value or None if the file is missing, malformed,
+        or has a different stamp.
+    """
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        with open(cache_file) as json_file:
+            content = json.load(json_file)
+    except (IOError, ValueError) as err:
+        logging.warn('cache issues: cannot load %s: %s' % (cache_file,
+                                                           str(err)))
+        return None
+    if not isinstance(content, dict) or content.get('version') != stamp:
+        return None
+    return content.get('entries')
+
+
+def save_value(cache_file, stamp, value):
+    """Writes the value with its stamp into the cache file atomically.
+
+    Args:
+        cache_file: The path to the cache file.
+        stamp: The JSON-compatible version stamp of the value.
+        value: The JSON-compatible value.
+    """
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    handle, temp_path = tempfile.mkstemp(dir=cache_dir)
+    try:
+        with os.fdopen(handle, 'w') as temp_file:
+            json.dump({'version': stamp, 'entries': value}, temp_file)
+        _replace(temp_path, cache_file)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class FileCache(object):
+    """On-disk cache of JSON-compatible values per file.
+
+    An entry is valid
+    if the file modification time and size are the same as recorded.
+    Otherwise, the entry is still valid
+    if the hash of the file content the value depends on has not changed.
+
+    Attributes:
+        cache_file: The path to the cache file.
+        version: The version stamp for the entries.
+        hits: The number of valid entries retrieved.
+        misses: The number of missing or outdated entries.
+    """
+
+    # The layout version of the cache file.
+    # Bump it with any change of the cached values or their meaning,
+    # e.g., the results of the include directive search,
+    # so that stale entries of earlier revisions are discarded.
+    #   2: [limits, cut_off, [include]] entries with scan limits.
+    #   3: The preamble ignores block comment markers in line comments.
+    #   4: Entries of the raw directives from the scan before interning.
+    #   5: The scan stops at the preamble end again.
+    #   6: [num_bytes, digest] of the file start the value depends on.
+    _FORMAT = 6
+
+    def __init__(self, cache_file, version):
+        """Loads the cache entries from the cache file if any.
+
+        The cache file with a different version is discarded.
+
+        Args:
+            cache_file: The path to the cache file.
+            version: The version stamp of the producer of the values.
+        """
+        self.cache_file = cache_file
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        # {path: [mtime, size, [num_bytes, digest], value]}
+        self.__entries = {}
+        self.__visited = set()  # Paths requested or updated in this run.
+        self.__load()
+
+    def __stamp(self):
+        """Returns the version stamp of the cache file."""
+        return [FileCache._FORMAT, self.version]
+
+    def __load(self):
+        """Loads entries with the matching version from the cache file."""
+        self.__entries = load_value(self.cache_file, self.__stamp()) or {}
+
+    def get(self, file_path):
+        """Retrieves the valid value for the file.
+
+        Args:
+            file_path: The path to the file.
+
+        Returns:
+            The cached value or None if the entry is missing or outdated.
+        """
+        self.__visited.add(file_path)
+        entry = self.__entries.get(file_path)
+        if entry is not None:
+            stat = os.stat(file_path)
+            if entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+                self.hits += 1
+                return entry[3]
+            num_bytes, digest = entry[2]
+            if (entry[1] == stat.st_size and
+                    digest == file_digest(file_path, num_bytes)):
+                entry[0] = stat.st_mtime
+                self.hits += 1
+                return entry[3]
+        self.misses += 1
+        return None
+
+    def put(self, file_path, value, digest=None):
+        """Records the value for the current state of the file.
+
+        Args:
+            file_path: The path to the file.
+            value: The JSON-compatible value.
+            digest: [num_bytes, digest] of the file start
+                the value depends on if already computed,
+                e.g., from the bytes read to produce the value.
+                The whole file is digested by default.
+        """
+        self.__visited.add(file_path)
+        stat = os.stat(file_path)
+        if digest is None:
+            digest = [stat.st_size, file_digest(file_path)]
+        self.__entries[file_path] = [
+            stat.st_mtime, stat.st_size, list(digest), value
+        ]
+
+    def save(self):
+        """Writes the cache file atomically.
+
+        The entries for the deleted files are evicted.
+        """
+        for file_path in list(self.__entries):
+            if (file_path not in self.__visited and
+                    not os.path.isfile(file_path)):
+                del self.__entries[file_path]
+        save_value(self.cache_file, self.__stamp(), self.__entries)
+
+    def __len__(self):
+        """The number of entries in the cache."""
+        return len(self.__entries)
@@ -21,28 +21,41 @@ for components/packages/package groups of a large C/C++ project.
 
 from __future__ import absolute_import
 
+import bisect
 import collections
 import fnmatch
 import glob
 import itertools
+import json
+import locale
 import logging
 import os.path
 import re
 import sys
+import weakref
 
-from yaml import safe_load
-from pykwalify.core import Core as Validator
-
+from . import profiling
+from .cache import (FileCache, content_digest, file_digest, load_value,
+                    save_value)
 from .graph import Graph
 
+try:
+    from os import scandir as _scandir
+except ImportError:  # Python 2 with the optional backport.
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None  # pylint: disable=invalid-name
+
 VERSION = '0.2.4'  # The latest release version.
 
 _SCHEMA_FILE = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), 'config_schema.yml')
 assert os.path.isfile(_SCHEMA_FILE), 'The cppdep schema file is missing.'
-assert safe_load(open(_SCHEMA_FILE))  # Will throw if invalid.
 
 _FILE_OPEN_FLAGS = {} if sys.version[0] == '2' else {'errors': 'replace'}
+_SRC_ENCODING = locale.getpreferredencoding(False)  # The text mode default.
+_SCAN_BLOCK_SIZE = 1 << 16  # Bytes to read at once in the bounded scan.
 
 # Allowed common abbreviations in the code:
 # ccd   - Cumulative Component Dependency (CCD)
@@ -67,6 +80,18 @@ class AnalysisError(Exception):
     pass
 
 
+class MalformedConfigError(Exception):
+    """The configuration file is not well-formed YAML."""
+
+    pass
+
+
+class InvalidConfigError(Exception):
+    """The configuration file is invalid against the schema."""
+
+    pass
+
+
 def warn(message):
     """Logs a warning message."""
     logging.warn(message)
@@ -86,6 +111,7 @@ def path_common(paths):
     """Returns common prefix path for the argument absolute normalized paths."""
     if not paths:
         return ''
+    paths = list(paths)
     path = os.path.commonprefix(paths)
     assert os.path.isabs(path)
     if path[-1] == os.path.sep:
@@ -109,6 +135,38 @@ def path_to_posix_sep(path):
     return path.replace('\\', '/') if os.name == 'nt' else path
 
 
+def load_config(config_file_path):
+    """Loads and validates the configuration file against the schema.
+
+    The YAML and schema validation libraries are imported on demand,
+    and their errors are reported with the cppdep exceptions.
+
+    Args:
+        config_file_path: The path to the configuration file.
+
+    Returns:
+        The configuration dictionary.
+
+    Raises:
+        MalformedConfigError: Errors loading yaml files.
+        InvalidConfigError: The configuration file is invalid.
+    """
+    from yaml import YAMLError, safe_load
+    from pykwalify.core import Core as Validator, SchemaError
+
+    # Load before validation to check for well-formed YAML.
+    with open(config_file_path) as config_file:
+        try:
+            config = safe_load(config_file)
+        except YAMLError as err:
+            raise MalformedConfigError(str(err))
+    try:
+        Validator(config_file_path, [_SCHEMA_FILE]).validate()
+    except SchemaError as err:
+        raise InvalidConfigError(str(err))
+    return config
+
+
 def yaml_optional(dictionary, element, default_value):
     """Retrieves optional element values with defaults."""
     return dictionary[element] if element in dictionary else default_value
@@ -119,20 +177,216 @@ def yaml_optional_list(dictionary, element):
     return yaml_optional(dictionary, element, [])
 
 
+def compile_globs(patterns):
+    """Compiles glob patterns for paths into one regex.
+
+    The regex matches the same paths as fnmatch.fnmatch with any pattern
+    if the paths are normalized with os.path.normcase.
+
+    Args:
+        patterns: Path glob patterns.
+
+    Returns:
+        The compiled regex or None if there are no patterns.
+    """
+    patterns = sorted(set(patterns))
+    if not patterns:
+        return None
+    return re.compile('|'.join('(?:%s)' %
+                               fnmatch.translate(os.path.normcase(x))
+                               for x in patterns))
+
+
+def _list_dir(dir_path):
+    """Returns (name, is_dir) of entries in a directory.
+
+    Symbolic links to directories are reported with None for is_dir.
+    """
+    if _scandir:
+        return [(x.name, None if x.is_symlink() and x.is_dir() else
+                 x.is_dir(follow_symlinks=False)) for x in _scandir(dir_path)]
+    entries = []
+    for name in os.listdir(dir_path):
+        path = os.path.join(dir_path, name)
+        is_dir = os.path.isdir(path)
+        entries.append((name, None if is_dir and os.path.islink(path) else
+                        is_dir))
+    return entries
+
+
+def walk_files(dir_path, ignore_regex=None):
+    """Generates paths of files in a directory tree.
+
+    The files are generated in the same order as with os.walk.
+    The directories matching the ignore regex are not traversed,
+    and symbolic links to directories are not followed.
+    The directory entry types from os.scandir are used if available
+    to avoid stat calls for every entry.
+
+    Args:
+        dir_path: The path to the root directory of the tree.
+        ignore_regex: The regex for normcase paths of ignored files and dirs.
+
+    Yields:
+        The paths of files not ignored.
+    """
+
+    def _is_ignored(path):
+        return ignore_regex and ignore_regex.match(os.path.normcase(path))
+
+    dir_paths = [dir_path]
+    while dir_paths:
+        root = dir_paths.pop()
+        if _is_ignored(root):
+            continue
+        try:
+            entries = _list_dir(root)
+        except OSError:  # Errors are ignored like in os.walk.
+            continue
+        sub_dir_paths = []
+        for name, is_dir in entries:
+            path = os.path.join(root, name)
+            if is_dir:
+                sub_dir_paths.append(path)
+            elif is_dir is not None and not _is_ignored(path):
+                yield path
+        sub_dir_paths.reverse()
+        dir_paths.extend(sub_dir_paths)
+
+
+def _decode_src(text):
+    """Decodes source file bytes as if the file were read in text mode."""
+    if sys.version[0] == '2':
+        return text
+    return text.decode(_SRC_ENCODING, 'replace')
+
+
+# The limits on the search for include directives in a source file:
+#   preamble - stop at the first declaration after the include directives.
+#   max_bytes - the maximum number of bytes to read (None for no limit).
+ScanLimits = collections.namedtuple('ScanLimits', ['preamble', 'max_bytes'])
+
+
+class _Preamble(object):
+    """Finder of the include preamble end in a source file.
+
+    The preamble consists of blank, comment, and preprocessor lines,
+    and it ends at the first line with a declaration (code).
+    The source text can be fed incrementally.
+
+    Attributes:
+        end: The offset of the first line after the preamble.
+    """
+
+    _RE_EXTERN_C = re.compile(br'extern\s*"C"\s*{?$')
+
+    def __init__(self):
+        """Starts at the beginning of the file."""
+        self.end = None
+        self.__pos = 0
+        self.__in_comment = False
+        self.__continued = False  # Preprocessor line continuation.
+
+    def feed(self, text, final):
+        """Advances over complete lines of the text read so far.
+
+        Args:
+            text: The source text from the beginning of the file.
+            final: True if the text is the whole source file.
+
+        Returns:
+            The offset of the preamble end or None if not found yet.
+        """
+        while self.end is None:
+            line_end = text.find(b'\n', self.__pos)
+            if line_end == -1:
+                if not final or self.__pos >= len(text):
+                    break
+                line_end = len(text)
+            if not self.__is_preamble(text[self.__pos:line_end].strip()):
+                self.end = self.__pos
+            self.__pos = line_end + 1
+        return self.end
+
+    def __is_preamble(self, line):
+        """Returns True if the stripped line belongs to the preamble."""
+        if self.__continued:
+            self.__continued = line.endswith(b'\\')
+            return True
+        while line:
+            if self.__in_comment:
+                close = line.find(b'*/')
+                if close == -1:
+                    return True
+                self.__in_comment = False
+                line = line[close + 2:].lstrip()
+            elif line.startswith(b'/*'):
+                self.__in_comment = True
+                line = line[2:]
+            elif line.startswith(b'//'):
+                return True
+            elif line.startswith(b'#'):
+                self.__continued = line.endswith(b'\\')
+                self.__in_comment = _Preamble.__ends_in_comment(line)
+                return True
+            else:
+                return bool(_Preamble._RE_EXTERN_C.match(line))
+        return True
+
+    @staticmethod
+    def __ends_in_comment(line):
+        """Returns True if the line ends inside a block comment.
+
+        The comment markers are matched from the line start,
+        so the markers in line comments and in block comments are ignored.
+        """
+        pos = 0
+        while True:
+            block_start = line.find(b'/*', pos)
+            line_start = line.find(b'//', pos)
+            if block_start == -1 or -1 < line_start < block_start:
+                return False
+            block_end = line.find(b'*/', block_start + 2)
+            if block_end == -1:
+                return True
+            pos = block_end + 2
+
+
 class Include(object):
     """Representation of an include directive.
 
+    The include directives gathered by grep_includes are interned
+    (flyweights), so the same directives in different files share one object.
+    The shared objects are located with find instead of locate.
+    Include.grep and Include.scan return new objects.
+
     Attributes:
         with_quotes: True if the include is within quotes ("")
             instead of angle brackets (<>).
         hfile: The normalized path to the header file in the directive.
-        hpath: The absolute path to the header file.
+        hpath: The absolute path to the header file set by locate.
     """
 
     _RE_INCLUDE = re.compile(r'^\s*#\s*include\s*'
                              r'(<(?P<brackets>\S+?)>|"(?P<quotes>\S+?)")')
 
-    __slots__ = ['__include_path', 'hfile', 'with_quotes', 'hpath']
+    # The superset of _RE_INCLUDE for raw lines in ASCII-compatible encodings,
+    # i.e., any non-ASCII byte may turn out to be whitespace upon decoding.
+    _RE_INCLUDE_BYTES = re.compile(
+        br'[\t\x0b\x0c\r\x1c-\x20\x80-\xff]*#'
+        br'[\t\x0b\x0c\r\x1c-\x20\x80-\xff]*include'
+        br'[\t\x0b\x0c\r\x1c-\x20\x80-\xff]*'
+        br'(<(?P<brackets>[^\t-\r\x20]+?)>|"(?P<quotes>[^\t-\r\x20]+?)")')
+
+    # The matches of the regexes above are identical on these characters.
+    _RE_PLAIN = re.compile(br'[\t\x0b\x0c\x20-\x7e]*\Z')
+
+    __slots__ = [
+        '__include_path', 'hfile', 'with_quotes', 'hpath', '__weakref__'
+    ]
+
+    # The shared includes are dropped with the last reference outside.
+    _interned = weakref.WeakValueDictionary()  # {(path, with_quotes): Include}
 
     def __init__(self, include_path, with_quotes):
         """Initializes with attributes.
@@ -146,6 +400,11 @@ class Include(object):
         self.with_quotes = with_quotes
         self.hpath = None
 
+    @property
+    def include_path(self):
+        """The original path in the include directive."""
+        return self.__include_path
+
     def __str__(self):
         """Produces the original include with quotes or brackets."""
         if self.with_quotes:
@@ -164,28 +423,149 @@ class Include(object):
         """Assumes the same working directory and search paths."""
         return not self == other
 
+    @staticmethod
+    def intern(include_path, with_quotes):
+        """Returns the shared include for the directive.
+
+        The path is normalized only once for all the same directives.
+
+        Args:
+            include_path: The original path in the include directive.
+            with_quotes: True if the path is within quotes instead of brackets.
+        """
+        key = (include_path, with_quotes)
+        include = Include._interned.get(key)
+        if include is None:
+            include = Include._interned[key] = Include(include_path,
+                                                       with_quotes)
+        return include
+
+    @staticmethod
+    def __directive(include, decode=lambda x: x):
+        """Returns (include_path, with_quotes) for the regex match."""
+        if include.group("brackets"):
+            return decode(include.group("brackets")), False
+        return decode(include.group("quotes")), True
+
     @staticmethod
     def grep(file_path):
         """Processes include directives in a source file.
 
+        The file is read as a whole in binary mode.
+        Only the lines containing 'include' are matched against the regex,
+        and only the matched paths are decoded.
+        The results are the same as with the reading in text mode.
+
         Args:
             file_path: The full path to the source file.
 
         Yields:
             Include objects constructed with the directives.
         """
+        with open(file_path, 'rb') as src_file:
+            text = src_file.read()
+        return (Include(*x) for x in Include.__grep_text(text))
+
+    @staticmethod
+    def __grep_text(text):
+        """Yields (include_path, with_quotes) in the binary text of a file."""
+        if sys.version[0] != '2' and b'\r' in text:  # Universal newlines.
+            text = text.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        pos = text.find(b'include')
+        while pos != -1:
+            line_start = text.rfind(b'\n', 0, pos) + 1
+            line_end = text.find(b'\n', pos)
+            if line_end == -1:
+                line_end = len(text)
+            include = Include._RE_INCLUDE_BYTES.match(text, line_start,
+                                                      line_end)
+            if include and Include._RE_PLAIN.match(include.group()):
+                yield Include.__directive(include, _decode_src)
+            elif include:  # Non-ASCII or control characters are involved.
+                include = Include._RE_INCLUDE.search(
+                    _decode_src(text[line_start:line_end]))
+                if include:
+                    yield Include.__directive(include)
+            pos = text.find(b'include', line_end)
+
+    @staticmethod
+    def scan(file_path, limits=None):
+        """Processes include directives in a source file within limits.
+
+        The reading stops at the preamble end,
+        and the text already read after the preamble end is checked
+        for include directives to report the cut-off.
+
+        Args:
+            file_path: The full path to the source file.
+            limits: ScanLimits to stop reading the file early.
+
+        Returns:
+            ([Include], cut_off) with cut_off being True
+            if the limits may have hidden include directives.
+        """
+        directives, cut_off = Include._scan(file_path, limits)[:2]
+        return [Include(*x) for x in directives], cut_off
+
+    @staticmethod
+    def _scan(file_path, limits=None, digest=False):
+        """Returns the results of scan, the number of bytes read, and digest.
+
+        The digest is [num_bytes, digest] of the text read from the file
+        if requested (None otherwise).
+        The directives are (include_path, with_quotes) tuples.
+        """
+        text, end, truncated = Include.__read(file_path, limits)
+        text_digest = [len(text), content_digest(text)] if digest else None
+        num_bytes = len(text) + truncated
+        if end is not None:
+            return (list(Include.__grep_text(text[:end])),
+                    any(Include.__grep_text(text[end:])), num_bytes,
+                    text_digest)
+        if truncated:  # Discard the partially read last line.
+            text = text[:text.rfind(b'\n') + 1]
+        return (list(Include.__grep_text(text)), truncated, num_bytes,
+                text_digest)
+
+    @staticmethod
+    def __read(file_path, limits):
+        """Reads the source file within the limits.
+
+        Returns:
+            (text, end, truncated) with the preamble end offset or None
+            and the flag for the text truncated by max_bytes.
+        """
+        with open(file_path, 'rb') as src_file:
+            if limits is None or not (limits.preamble or limits.max_bytes):
+                return src_file.read(), None, False
+            max_bytes = limits.max_bytes or float('inf')
+            preamble = _Preamble() if limits.preamble else None
+            text = bytearray()
+            while len(text) < max_bytes:
+                size = min(_SCAN_BLOCK_SIZE, max_bytes - len(text))
+                block = src_file.read(int(size))
+                text += block
+                if preamble and preamble.feed(text, not block) is not None:
+                    return bytes(text), preamble.end, False
+                if not block:
+                    return bytes(text), None, False
+            return bytes(text), None, bool(src_file.read(1))
+
+    @staticmethod
+    def _grep_lines(file_path):
+        """The reference implementation of grep in text mode line by line."""
         with open(file_path, **_FILE_OPEN_FLAGS) as src_file:
             for line in src_file:
                 include = Include._RE_INCLUDE.search(line)
-                if not include:
-                    continue
-                if include.group("brackets"):
-                    yield Include(include.group("brackets"), with_quotes=False)
-                else:
-                    yield Include(include.group("quotes"), with_quotes=True)
+                if include:
+                    yield Include(*Include.__directive(include))
 
-    def locate(self, cwd, include_dirs, include_patterns):
-        """Locates the included header file path.
+    def locate(self,
+               cwd,
+               include_dirs,
+               include_patterns,
+               isfile=os.path.isfile):
+        """Locates the included header file path and sets hpath.
 
         All input directory paths must be absolute.
 
@@ -193,35 +573,333 @@ class Include(object):
             cwd: The working directory for source file processing.
             include_dirs: The directories to search for the file,
                 ordered from internal to external/system directories.
-            include_patterns: (package, [regex]) to search with patterns.
+            include_patterns: The PatternMatcher of external packages.
+            isfile: The predicate to check if a path is an existing file.
 
         Returns:
             (hpath, package) with None indicating failure to find the file.
         """
         assert self.hpath is None
+        hpath, package = self.find(cwd, include_dirs, include_patterns,
+                                   isfile)
+        if package is None:
+            self.hpath = hpath
+        return hpath, package
+
+    def find(self, cwd, include_dirs, include_patterns, isfile=os.path.isfile):
+        """Finds the included header file path without changing the include.
+
+        The arguments and results are the same as in locate.
+        """
 
         def _find_in(include_dir):
-            """Returns True if the path is found."""
+            """Returns the path to the file in the directory or None."""
             file_hpath = path_normjoin(include_dir, self.hfile)
-            if os.path.isfile(file_hpath):
-                self.hpath = file_hpath
-                return True
-            return False
+            return file_hpath if isfile(file_hpath) else None
 
-        if self.with_quotes and _find_in(cwd):
-            return self.hpath, None
+        hpath = self.with_quotes and _find_in(cwd)
+        if hpath:
+            return hpath, None
 
-        for package, patterns in include_patterns:
-            if any(x.match(self.hfile) for x in patterns):
-                return self.hfile, package
+        package = include_patterns.match(self.hfile)
+        if package is not None:
+            return self.hfile, package
 
         direction = iter if self.with_quotes else reversed
-        if any(_find_in(x) for x in direction(include_dirs)):
-            return self.hpath, None
+        for include_dir in direction(include_dirs):
+            hpath = _find_in(include_dir)
+            if hpath:
+                return hpath, None
 
         return None, None
 
 
+class PathTable(object):
+    """Table of distinct paths with integer ids.
+
+    Each distinct path string is stored once
+    and shared by all the objects and indices referring to the path.
+    The ids are assigned in the order of addition starting from 0.
+    """
+
+    __slots__ = ['__ids', '__paths']
+
+    def __init__(self):
+        """Initializes an empty table."""
+        self.__ids = {}  # {path: path_id}
+        self.__paths = []  # [path] by path id
+
+    def id(self, path):  # pylint: disable=invalid-name
+        """Returns the id of the path added into the table if new."""
+        path_id = self.__ids.get(path)
+        if path_id is None:
+            path_id = self.__ids[path] = len(self.__paths)
+            self.__paths.append(path)
+        return path_id
+
+    def path(self, path_id):
+        """Returns the shared string of the path with the id."""
+        return self.__paths[path_id]
+
+    def intern(self, path):
+        """Returns the shared string of the path added into the table if new."""
+        return self.__paths[self.id(path)]
+
+    def __len__(self):
+        """The number of distinct paths in the table."""
+        return len(self.__paths)
+
+
+class DirectoryIndex(object):
+    """In-memory index of files in directories.
+
+    Each directory is listed once upon the first lookup of a file in it.
+    The subsequent lookups in the directory do not access the filesystem
+    unless the file name matches a listed name only case-insensitively.
+    Such files are checked on the filesystem
+    because it may be case-insensitive (e.g., the default on macOS).
+    Only these checks are counted in the profile as 'index fallback stats'
+    while the stats of the directory listing and elsewhere are not.
+
+    Attributes:
+        fallback: Check the filesystem for files missing in the index,
+            e.g., files created after the directory listing.
+    """
+
+    def __init__(self, fallback=False):
+        """Initializes an empty index.
+
+        Args:
+            fallback: Check the filesystem for files missing in the index.
+        """
+        self.fallback = fallback
+        self.__dirs = {}  # {dir_path: frozenset(filename)|None}
+        self.__lower_dirs = {}  # {dir_path: frozenset(lower_filename)}
+
+    @staticmethod
+    def __list_files(dir_path):
+        """Returns normalized names of files in a directory or None."""
+        profiling.count('directories listed')
+        try:
+            if _scandir:
+                return frozenset(
+                    os.path.normcase(x.name) for x in _scandir(dir_path)
+                    if x.is_file())
+            return frozenset(
+                os.path.normcase(x) for x in os.listdir(dir_path)
+                if os.path.isfile(os.path.join(dir_path, x)))
+        except OSError:  # Not a directory.
+            return None
+
+    def __has_case_variant(self, dir_path, files, filename):
+        """Returns True if the file name differs only in case from a file."""
+        if dir_path not in self.__lower_dirs:
+            self.__lower_dirs[dir_path] = frozenset(x.lower() for x in files)
+        return filename.lower() in self.__lower_dirs[dir_path]
+
+    def isfile(self, path):
+        """Returns True if the absolute normalized path is a file."""
+        dir_path, filename = os.path.split(os.path.normcase(path))
+        if dir_path in self.__dirs:
+            files = self.__dirs[dir_path]
+        else:
+            files = self.__dirs[dir_path] = DirectoryIndex.__list_files(
+                dir_path)
+        if files is None:
+            case_variant = False
+        elif filename in files:
+            return True
+        else:
+            case_variant = self.__has_case_variant(dir_path, files, filename)
+        if not (self.fallback or case_variant):
+            return False
+        profiling.count('index fallback stats')
+        return os.path.isfile(path)
+
+
+class PatternMatcher(object):
+    """Matcher of header names to packages by include regex patterns.
+
+    The patterns of all packages are combined into alternations
+    with a named group per package,
+    so the owning package is found in one pass of the regex engine.
+    Patterns that cannot be combined safely
+    (back-references, conditionals, global inline flags)
+    are matched separately in their place in the search order.
+    """
+
+    # Patterns relying on their own group numbering or setting global flags.
+    _RE_UNCOMBINABLE = re.compile(r'\\[1-9]|\(\?(P=|\(|[aiLmsux]+\))')
+    # The limit of groups in a regex for Python 2;
+    # larger alternations are also slower with many groups to reset.
+    _MAX_GROUPS = 99
+
+    def __init__(self, include_patterns=()):
+        """Compiles the patterns.
+
+        Args:
+            include_patterns: (package, [regex pattern string])
+                in the search order of packages.
+
+        Raises:
+            re.error: Invalid regex patterns.
+        """
+        self.__packages = []  # The packages by the index in the group name.
+        self.__matchers = []  # [(regex, package|None for the group name)]
+        chunk = []  # [(package, [regex])]
+        num_groups = 0  # The number of groups in the combined chunk regex.
+        for package, patterns in include_patterns:
+            regexes = [re.compile(x) for x in patterns]
+            if not regexes:
+                continue
+            if any(PatternMatcher._RE_UNCOMBINABLE.search(x) for x in patterns):
+                self.__add_chunk(chunk)
+                chunk, num_groups = [], 0
+                self.__matchers.extend((x, package) for x in regexes)
+                continue
+            package_groups = 1 + sum(x.groups for x in regexes)
+            if num_groups + package_groups > PatternMatcher._MAX_GROUPS:
+                self.__add_chunk(chunk)
+                chunk, num_groups = [], 0
+            chunk.append((package, regexes))
+            num_groups += package_groups
+        self.__add_chunk(chunk)
+
+    def __add_chunk(self, chunk):
+        """Combines the regexes of packages into one matcher."""
+        if not chunk:
+            return
+        if len(chunk) == 1 and len(chunk[0][1]) == 1:
+            self.__matchers.append((chunk[0][1][0], chunk[0][0]))
+            return
+        alternatives = []
+        for package, regexes in chunk:
+            alternatives.append('(?P<_p%d>%s)' %
+                                (len(self.__packages),
+                                 '|'.join('(?:%s)' % x.pattern
+                                          for x in regexes)))
+            self.__packages.append(package)
+        try:
+            self.__matchers.append((re.compile('|'.join(alternatives)), None))
+        except (re.error, AssertionError, OverflowError):  # Group name clash.
+            for package, regexes in chunk:
+                self.__matchers.extend((x, package) for x in regexes)
+
+    def match(self, hfile):
+        """Returns the first package with a pattern matching the header."""
+        for regex, package in self.__matchers:
+            match = regex.match(hfile)
+            if match:
+                if package is None:
+                    return self.__packages[int(match.lastgroup[2:])]
+                return package
+        return None
+
+
+def _scan_src_file(src_file):
+    """Returns include directives, the cut-off flag, bytes read, and digest.
+
+    Args:
+        src_file: (file_path, ScanLimits or None, digest) with the flag
+            to digest the text read from the file.
+    """
+    with profiling.span('scan', src_file[0]):
+        return Include._scan(*src_file)  # pylint: disable=protected-access
+
+
+def _trace_scan_src_file(src_file):
+    """Returns the results of _scan_src_file and the trace events.
+
+    The span of the file is recorded in the trace of the worker process
+    to be merged into the trace of the parent process.
+    """
+    profiling.enable_trace()
+    result = _scan_src_file(src_file)
+    return result, profiling.disable_trace().events
+
+
+def _pool_scan_src_files(scan_args, processes):
+    """Scans the source files in worker processes.
+
+    The trace events of the workers are gathered into the active trace.
+
+    Args:
+        scan_args: The arguments to _scan_src_file for each file.
+        processes: The number of worker processes.
+
+    Returns:
+        [result of _scan_src_file] in the order of the arguments.
+    """
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    trace = profiling.active_trace()
+    try:
+        if trace is None:
+            return pool.map(_scan_src_file, scan_args)
+        results = []
+        for result, events in pool.map(_trace_scan_src_file, scan_args):
+            results.append(result)
+            trace.events.extend(events)
+        return results
+    finally:
+        pool.close()
+        pool.join()
+
+
+def grep_includes(src_files, jobs=1, cache=None):
+    """Processes include directives in source files.
+
+    The files are distributed among worker processes if requested.
+    The same include directives in all the files share interned objects.
+    Warns about the files with include directives hidden by the limits.
+
+    Args:
+        src_files: (file_path, ScanLimits or None) of the source files.
+        jobs: The number of parallel jobs to process the files.
+        cache: The FileCache with include directives from previous runs.
+
+    Returns:
+        {file_path: [Include]} with the directives in the file order.
+    """
+    # {file_path: ([directive], cut_off[, num_bytes, digest])}
+    results = {}
+    src_files = outdated_files = list(src_files)
+    if cache is not None:
+        outdated_files = []
+        for file_path, limits in src_files:
+            entry = cache.get(file_path)  # [limits, cut_off, [include]]
+            if entry is None or entry[0] != (limits and list(limits)):
+                outdated_files.append((file_path, limits))
+            else:
+                results[file_path] = (entry[2], entry[1])
+
+    # The cache entries are validated with the digest of the text read.
+    scan_args = [(x, y, cache is not None) for x, y in outdated_files]
+    if jobs < 2 or len(outdated_files) < 2:
+        results.update((x[0], _scan_src_file(x)) for x in scan_args)
+    else:
+        results.update(
+            zip((x for x, _ in outdated_files),
+                _pool_scan_src_files(scan_args,
+                                     min(jobs, len(outdated_files)))))
+    profiling.count('files scanned', len(outdated_files))
+    profiling.count('bytes read',
+                    sum(results[x][2] for x, _ in outdated_files))
+
+    if cache is not None:
+        profiling.count('scan cache hits', cache.hits)
+        for file_path, limits in outdated_files:
+            directives, cut_off, _, digest = results[file_path]
+            cache.put(file_path, [limits and list(limits), cut_off, directives],
+                      digest)
+    for file_path, _ in src_files:
+        if results[file_path][1]:
+            warn('include issues: scan cut-off: '
+                 '%s may have more include directives' % file_path)
+    return dict((x, [Include.intern(*z) for z in y[0]])
+                for x, y in results.items())
+
+
 class Component(object):
     """Representation of a component in a package.
 
@@ -232,11 +910,18 @@ class Component(object):
         package: The package this component belongs to.
         working_dir: The parent directory.
         dep_components: Dependency components.
-        includes_in_h: Include directives in the header file.
-        includes_in_c: Include directives in the implementation file.
+        includes_in_h: Include directives in the header file
+            (None after release_includes).
+        includes_in_c: Include directives in the implementation file
+            (None after release_includes).
     """
 
-    def __init__(self, hpath, cpath, package):
+    __slots__ = [
+        'name', 'hpath', 'cpath', 'package', 'working_dir', 'dep_components',
+        'includes_in_h', 'includes_in_c'
+    ]
+
+    def __init__(self, hpath, cpath, package, includes=None, paths=None):
         """Initialization of a free-standing component.
 
         Warns about incomplete components.
@@ -245,8 +930,14 @@ class Component(object):
             hpath: The path to the header file of the component.
             cpath: The path to the implementation file of the component.
             package: The package this components belongs to.
+            includes: {path: [Include]} pre-processed include directives.
+                The component files missing in the map are processed here.
+            paths: The PathTable to share the path strings.
         """
         assert hpath or cpath
+        if paths is not None:
+            hpath = hpath and paths.intern(hpath)
+            cpath = cpath and paths.intern(cpath)
         self.name = path_to_posix_sep(
             strip_ext(os.path.relpath(cpath or hpath, package.root)))
         if not hpath:
@@ -256,19 +947,35 @@ class Component(object):
         self.cpath = cpath
         self.package = package
         self.working_dir = os.path.dirname(cpath or hpath)
+        if paths is not None:
+            self.working_dir = paths.intern(self.working_dir)
         self.dep_components = set()
-        self.includes_in_h = set() if not hpath else list(Include.grep(hpath))
-        self.includes_in_c = set() if not cpath else list(Include.grep(cpath))
+        self.includes_in_h = Component.__grep(hpath, includes)
+        self.includes_in_c = Component.__grep(cpath, includes)
         self.__sanitize_includes()
 
     def __str__(self):
         """For printing graph nodes."""
         return self.name
 
+    @staticmethod
+    def __grep(path, includes):
+        """Returns include directives in the component file."""
+        if not path:
+            return set()
+        if includes is not None and path in includes:
+            return list(includes[path])
+        return list(Include.grep(path))
+
     def dependencies(self):
         """Returns dependency components."""
         return self.dep_components
 
+    def release_includes(self):
+        """Drops include directives no longer needed after the location."""
+        self.includes_in_h = None
+        self.includes_in_c = None
+
     def __sanitize_includes(self):
         """Sanitizes and checks includes."""
 
@@ -330,6 +1037,145 @@ class ExternalComponent(object):
         self.package = package
 
 
+class _PathTrieNode(object):
+    """A node in the trie of reversed paths to pair component files.
+
+    Attributes:
+        size: The number of files in the subtree of the node.
+        available: The number of files in the subtree not yet removed.
+    """
+
+    __slots__ = ['size', 'available', '__parent', '__name', '__children',
+                 '__open_names', '__files']
+
+    def __init__(self, parent=None, name=None):
+        """Initializes an empty node for the name under the parent node."""
+        self.size = 0
+        self.available = 0
+        self.__parent = parent
+        self.__name = name
+        self.__children = {}
+        self.__open_names = []  # Sorted names of children with files.
+        self.__files = []  # Files ending at the node sorted in the end.
+
+    def insert(self, names, value):
+        """Adds a file value at the path of names from this node."""
+        node = self
+        node.size += 1
+        for name in names:
+            child = node.__children.get(name)
+            if child is None:
+                child = node.__children[name] = _PathTrieNode(node, name)
+            node = child
+            node.size += 1
+        node.__files.append(value)
+
+    def seal(self):
+        """Prepares the subtree for queries after all insertions."""
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            node.available = node.size
+            node.__open_names = sorted(node.__children)
+            node.__files.sort()
+            nodes.extend(node.__children.values())
+
+    def lineage(self, names):
+        """Returns the nodes on the longest matching path of names."""
+        nodes = [self]
+        for name in names:
+            node = nodes[-1].__children.get(name)
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def pop_max(self):
+        """Removes the available file with the greatest path of names.
+
+        The files ending at the same node are ordered by their values.
+
+        Returns:
+            The value of the removed file.
+        """
+        assert self.available
+        node = self
+        while node.__open_names:
+            node = node.__children[node.__open_names[-1]]
+        value = node.__files.pop()
+        while node is not None:
+            node.available -= 1
+            if not node.available and node.__parent is not None:
+                open_names = node.__parent.__open_names
+                del open_names[bisect.bisect_left(open_names, node.__name)]
+            node = node.__parent
+        return value
+
+
+def _lineage_key(root, cfile):
+    """Returns the pairing order key and the lineage of the c file in the trie.
+
+    The key lists (depth, num_files) of headers
+    from the longest common ancestry.
+    """
+    nodes = root.lineage(cfile.rev_path)
+    key = []
+    num_below = 0
+    for depth in range(len(nodes) - 1, -1, -1):
+        num_files = nodes[depth].size - num_below
+        if num_files:
+            key.append((depth, num_files))
+        num_below = nodes[depth].size
+    return key, nodes
+
+
+def _pair_files(hfiles, cfiles):
+    """Pairs header and implementation files with the same name.
+
+    Args:
+        hfiles: The header files with path and rev_path attributes.
+        cfiles: The implementation files with path and rev_path attributes.
+
+    Yields:
+        (hpath, cpath) pairs with None for unpaired files.
+    """
+    # This should probably be solved with a graph algorithm.
+    # Find the nodes with the longest matching consecutive ancestors
+    # starting from the node (not the root!).
+    # The nodes represent the file and directory names.
+    #
+    # The association is indeterminate or ambiguous
+    # if multiple nodes share the same common ancestors of the same number.
+    # Therefore, the algorithm to find
+    # the lowest common ancestor seems to lead to false answers.
+    # The trie of reversed paths finds the same header for each c file
+    # as the greedy selection from all the headers
+    # sorted by the number of consecutive ancestors and paths.
+    assert hfiles and cfiles
+    root = _PathTrieNode()
+    for index, hfile in enumerate(hfiles):
+        # The first of duplicate files is paired first.
+        root.insert(hfile.rev_path, (hfile.path, -index))
+    root.seal()
+
+    # The c files with more headers of longer common ancestry first.
+    candidates = [(x, _lineage_key(root, x)) for x in cfiles]
+    candidates.sort(reverse=True, key=lambda x: x[1][0])
+    paired = [False] * len(hfiles)
+    for cfile, (_, nodes) in candidates:
+        node = next((x for x in reversed(nodes) if x.available), None)
+        if node is None:
+            yield None, cfile.path
+            continue
+        hpath, index = node.pop_max()
+        paired[-index] = True
+        yield hpath, cfile.path
+
+    for hfile, is_paired in zip(hfiles, paired):
+        if not is_paired:
+            yield hfile.path, None
+
+
 class Package(object):
     """A collection of components.
 
@@ -341,13 +1187,27 @@ class Package(object):
         group: The package group this package belongs to.
         root: The common root path for all the paths in the package.
         components: The list of unique components in this package.
+        scan_limits: ScanLimits for source files or None for full scan.
     """
 
     _RE_SRC = re.compile(r'(?i)[\w\-]+((?P<h>(\.h(h|xx|\+\+|pp)?)?)|'
                          r'(?P<c>\.((c(c|xx|\+\+|pp)?)|ipp)))$')
 
-    def __init__(self, name, group, src_paths, include_paths, alias_paths,
-                 include_patterns, ignore_paths):
+    __slots__ = [
+        'name', 'group', 'src_paths', 'include_paths', 'ignore_paths',
+        'alias_paths', 'include_patterns', 'scan_limits', '__ignore_regex',
+        'root', 'components', '__dep_packages'
+    ]
+
+    def __init__(self,
+                 name,
+                 group,
+                 src_paths,
+                 include_paths,
+                 alias_paths,
+                 include_patterns,
+                 ignore_paths,
+                 scan_limits=None):
         """Constructs an empty package.
 
         Registers the package in the package group.
@@ -361,6 +1221,7 @@ class Package(object):
             alias_paths: Additional directory paths aliasing to the package.
             include_patterns: Regex pattern strings for include directives.
             ignore_paths: Exlusion paths from the source (glob patterns).
+            scan_limits: ScanLimits to process the package source files.
 
         Raises:
             InvalidArgumentError: Issues with the argument directory paths.
@@ -372,7 +1233,9 @@ class Package(object):
         self.ignore_paths = set()
         self.alias_paths = set()
         self.include_patterns = include_patterns
+        self.scan_limits = scan_limits
         self.__init_paths(src_paths, include_paths, alias_paths, ignore_paths)
+        self.__ignore_regex = compile_globs(self.ignore_paths)
         self.root = path_common(self.src_paths)
         self.components = []
         self.__dep_packages = None  # set of dependency packages
@@ -382,6 +1245,11 @@ class Package(object):
         """For printing graph nodes."""
         return self.name
 
+    @property
+    def full_name(self):
+        """The name of the package qualified with the group name."""
+        return '%s.%s' % (self.group.name, self.name)
+
     def __init_paths(self, src_paths, include_paths, alias_paths, ignore_paths):
         """Initializes package paths."""
 
@@ -406,8 +1274,35 @@ class Package(object):
         _update(self.alias_paths, alias_paths)
         self.alias_paths.update(self.include_paths)
 
-    def construct_components(self):
-        """Traverses the package paths and constructs package components.
+    def construct_components(self,
+                             component_files=None,
+                             includes=None,
+                             paths=None):
+        """Constructs package components from paired files.
+
+        Args:
+            component_files: [(hpath, cpath)] pairs of component files.
+                If None, the files are found with the package traversal.
+            includes: {path: [Include]} pre-processed include directives.
+            paths: The PathTable to share the path strings of components.
+        """
+        if component_files is None:
+            component_files = self.find_component_files()
+        if includes is None:
+            includes = grep_includes((path, self.scan_limits)
+                                     for pair in component_files
+                                     for path in pair if path)
+
+        def _construct(hpath, cpath):
+            with profiling.span('component', hpath or cpath):
+                return Component(hpath, cpath, self, includes, paths)
+
+        with profiling.span('construct', self.full_name):
+            self.components.extend(
+                _construct(hpath, cpath) for hpath, cpath in component_files)
+
+    def find_component_files(self, jobs=1):
+        """Traverses the package paths and pairs component files.
 
         Even though John Lakos defined a component as a pair of h and c files,
         C++ can have template only components
@@ -420,6 +1315,13 @@ class Package(object):
         are counted as components by default.
 
         Unpaired c files are counted as incomplete components with warnings.
+
+        Args:
+            jobs: The number of threads to traverse the source paths.
+
+        Returns:
+            [(hpath, cpath)] pairs of component files
+            with None for a missing file.
         """
         file_type = collections.namedtuple('File', ['rev_path', 'path'])
         hpaths = collections.defaultdict(list)
@@ -433,84 +1335,69 @@ class Package(object):
             path.reverse()
             return path
 
-        def _select_src_file(root, filename):
-            full_path = os.path.join(root, filename)
-            if any(fnmatch.fnmatch(full_path, x) for x in self.ignore_paths):
-                return
+        def _select_src_file(full_path):
+            filename = os.path.basename(full_path)
             src_match = Package._RE_SRC.match(filename)
             if src_match:
                 src_container = hpaths if src_match.group('h') else cpaths
                 src_container[strip_ext(filename)].append(
                     file_type(_reverse(full_path), full_path))
 
-        def _gather_files(dir_path):
-            for root, _, files in os.walk(dir_path):
-                if any(fnmatch.fnmatch(root, x) for x in self.ignore_paths):
-                    continue
-                for filename in files:
-                    _select_src_file(root, filename)
-
-        for glob_path in self.src_paths:
-            for src_path in glob.iglob(glob_path):
-                if os.path.isdir(src_path):
-                    _gather_files(src_path)
-                else:
-                    _select_src_file(*os.path.split(src_path))
-
-        self.__pair_files(hpaths, cpaths)
-
-    def __pair_files(self, hpaths, cpaths):
-        """Pairs header and implementation files into components."""
-
-        # This should probably be solved with a graph algorithm.
-        # Find the nodes with the longest matching consecutive ancestors
-        # starting from the node (not the root!).
-        # The nodes represent the file and directory names.
-        #
-        # The association is indeterminate or ambiguous
-        # if multiple nodes share the same common ancestors of the same number.
-        # Therefore, the algorithm to find
-        # the lowest common ancestor seems to lead to false answers.
-        def _num_consecutive_ancestors(file_one, file_two):
-            return sum(1 for _ in itertools.takewhile(
-                lambda x: x[0] == x[1], zip(file_one.rev_path,
-                                            file_two.rev_path)))
-
-        def _pair(hfiles, cfiles):
-            assert hfiles and cfiles  # Expected to have few elements.
-            candidates = [(x,
-                           sorted(
-                               ((_num_consecutive_ancestors(x, y), y)
-                                for y in hfiles),
-                               reverse=True))
-                          for x in cfiles]
-            candidates.sort(
-                reverse=True, key=lambda x: tuple(y for y, _ in x[1]))
-            for cfile, hfile_candidates in candidates:
-                for _, hfile in hfile_candidates:
-                    if hfile in hfiles:
-                        yield hfile.path, cfile.path
-                        hfiles.remove(hfile)
-                        break
-                else:
-                    yield None, cfile.path
-
-            for hfile in hfiles:
-                yield hfile.path, None
+        with profiling.span('discover', self.full_name):
+            src_paths = [
+                src_path
+                for glob_path in self.src_paths
+                for src_path in glob.iglob(glob_path)
+            ]
+            if jobs < 2 or len(src_paths) < 2:
+                src_files = [self.__list_src_files(x) for x in src_paths]
+            else:
+                import multiprocessing.pool
+                pool = multiprocessing.pool.ThreadPool(
+                    min(jobs, len(src_paths)))
+                try:
+                    src_files = pool.map(self.__list_src_files, src_paths)
+                finally:
+                    pool.close()
+                    pool.join()
+            for full_path in itertools.chain.from_iterable(src_files):
+                _select_src_file(full_path)
+
+            return list(self.__pair_files(hpaths, cpaths))
+
+    def __list_src_files(self, src_path):
+        """Returns the files of the source path within the trace span."""
+        with profiling.span('walk', src_path):
+            return self.__walk_src_path(src_path)
+
+    def __walk_src_path(self, src_path):
+        """Returns the paths of not ignored files in the source path.
+
+        The source path is a directory to walk or a single file.
+        """
+        if os.path.isdir(src_path):
+            return list(walk_files(src_path, self.__ignore_regex))
+        if (self.__ignore_regex and
+                self.__ignore_regex.match(os.path.normcase(src_path))):
+            return []
+        return [src_path]
 
+    @staticmethod
+    def __pair_files(hpaths, cpaths):
+        """Pairs header and implementation files of components."""
         for filename, hfiles in hpaths.items():
             if filename not in cpaths:
-                self.components.extend(
-                    Component(x.path, None, self) for x in hfiles)
+                for hfile in hfiles:
+                    yield hfile.path, None
             else:
                 cfiles = cpaths[filename]
                 del cpaths[filename]
-                self.components.extend(
-                    Component(x, y, self) for x, y in _pair(hfiles, cfiles))
+                for pair in _pair_files(hfiles, cfiles):
+                    yield pair
 
         for cfiles in cpaths.values():
-            self.components.extend(
-                Component(None, x.path, self) for x in cfiles)
+            for cfile in cfiles:
+                yield None, cfile.path
 
     def dependencies(self):
         """Returns dependency packages."""
@@ -532,6 +1419,8 @@ class PackageGroup(object):
         packages: {package_name: package} belonging to this group.
     """
 
+    __slots__ = ['name', 'path', 'packages', '__dep_groups']
+
     def __init__(self, name, path):
         """Constructs an empty group.
 
@@ -591,48 +1480,98 @@ class DependencyAnalysis(object):
         include_dirs: Directories to search for included headers.
             It is ordered,
             starting from internal and ending with external directories.
+        jobs: The number of parallel jobs to process source files.
+        cache_dir: The directory to keep results between runs.
+        release_includes: Drop include directives of components,
+            the memo of their locations, and the path table
+            after the location.
+        file_index: DirectoryIndex to search for included headers.
+        paths: PathTable of component paths and working directories
+            (None after the location with release_includes).
+        locate_hits: The number of include directives located
+            with the results for the same directives in the same context.
+        locate_misses: The number of include directives located anew.
     """
 
-    def __init__(self, config_file):
+    _INCLUDE_CACHE = 'includes.json'  # The file with cached include directives.
+    _CONFIG_CACHE = 'config.json'  # The file with the validated configuration.
+
+    def __init__(self,
+                 config_file,
+                 jobs=1,
+                 cache_dir=None,
+                 fs_fallback=False,
+                 release_includes=False):
         """Initializes analysis containers.
 
         Args:
             config_file: The path to the configuration file.
+            jobs: The number of parallel jobs to process source files.
+            cache_dir: The directory to keep results between runs.
+            fs_fallback: Check the filesystem for headers
+                missing in the directory index.
+            release_includes: Drop include directives after the location
+                if only dependencies of components are needed.
 
         Raises:
-            YAMLError: Errors loading yaml files.
-            SchemaError: The config file is malformed or invalid.
+            MalformedConfigError: Errors loading yaml files.
+            InvalidConfigError: The config file is invalid.
             InvalidArgumentError: The configuration has is invalid values.
         """
+        if jobs < 1:
+            raise InvalidArgumentError('The number of jobs must be positive.')
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+        self.release_includes = release_includes
+        self.file_index = DirectoryIndex(fs_fallback)
+        self.paths = PathTable()
         self.config = None
         self.external_groups = {}
         self.internal_groups = {}
         self.include_dirs = []
         self._external_components = {}  # {hpath: ExternalComponent}
         self._internal_components = {}  # {hpath: Component}
-        self.__package_aliases = []  # Sorted [(alias_path, external_package)]
-        self.__include_patterns = []  # [(package, [regex])]
-        self.__parse_config(config_file)
-        self.__gather_include_dirs()
-        self.__gather_aliases()
-        self.__gather_include_patterns()
+        self.__package_aliases = {}  # {alias_path: external_package}
+        self.__include_patterns = None  # PatternMatcher
+        self.__locations = {}  # {(hfile, with_quotes, cwd): component}
+        self.locate_hits = 0
+        self.locate_misses = 0
+        with profiling.phase('config'):
+            self.__parse_config(config_file)
+        with profiling.phase('setup'):
+            self.__gather_include_dirs()
+            self.__gather_aliases()
+            self.__gather_include_patterns()
         self.make_components()
 
     def __parse_config(self, config_file_path):
         """Parses the configuration file.
 
+        The validated configuration is cached in the cache directory
+        for the configuration and schema file contents.
+
         Args:
             config_file_path: The path to the configuration file.
 
         Raises:
-            YAMLError: Errors loading yaml files.
-            SchemaError: The configuration file is malformed or invalid.
+            MalformedConfigError: Errors loading yaml files.
+            InvalidConfigError: The configuration file is invalid.
             InvalidArgumentError: The configuration has invalid values.
         """
-        # Load before validation to check for well-formed YAML.
-        with open(config_file_path) as config_file:
-            self.config = safe_load(config_file)
-        Validator(config_file_path, [_SCHEMA_FILE]).validate()
+        cache_file = None
+        if self.cache_dir is not None:
+            cache_file = os.path.join(self.cache_dir,
+                                      DependencyAnalysis._CONFIG_CACHE)
+            stamp = [
+                VERSION,
+                file_digest(_SCHEMA_FILE),
+                file_digest(config_file_path)
+            ]
+            self.config = load_value(cache_file, stamp)
+        if self.config is None:
+            self.config = load_config(config_file_path)
+            if cache_file is not None:
+                save_value(cache_file, stamp, self.config)
 
         for pkg_group_config in self.config['internal']:
             DependencyAnalysis.__add_package_group(pkg_group_config,
@@ -660,12 +1599,18 @@ class DependencyAnalysis(object):
         package_group = PackageGroup(group_name, group_path)
 
         for pkg_config in pkg_group_config['packages']:
+            scan_config = yaml_optional(pkg_config, 'scan', None)
+            scan_limits = None
+            if scan_config:
+                scan_limits = ScanLimits(
+                    yaml_optional(scan_config, 'preamble', False),
+                    yaml_optional(scan_config, 'max_bytes', None))
             Package(pkg_config['name'], package_group,
                     yaml_optional_list(pkg_config, 'src'),
                     yaml_optional_list(pkg_config, 'include'),
                     yaml_optional_list(pkg_config, 'alias'),
                     yaml_optional_list(pkg_config, 'pattern'),
-                    yaml_optional_list(pkg_config, 'ignore'))
+                    yaml_optional_list(pkg_config, 'ignore'), scan_limits)
 
         pkg_groups[group_name] = package_group
 
@@ -684,23 +1629,24 @@ class DependencyAnalysis(object):
         """Gathers aliases for *external* packages lazy include search."""
         for group in self.external_groups.values():
             for package in group.packages.values():
-                self.__package_aliases.extend(
-                    (x, package) for x in package.alias_paths)
-        self.__package_aliases.sort()
-        assert (len(set(x for x, _ in self.__package_aliases)) == len(
-            self.__package_aliases)), "Ambiguous aliases to packages"
+                for alias_path in package.alias_paths:
+                    assert alias_path not in self.__package_aliases, (
+                        "Ambiguous aliases to packages")
+                    self.__package_aliases[alias_path] = package
 
     def __gather_include_patterns(self):
-        """Gathers and compiles include patterns into regex objects."""
-        for group in self.external_groups.values():
-            for package in group.packages.values():
-                self.__include_patterns.append(
-                    (package,
-                     [re.compile(x) for x in package.include_patterns]))
+        """Gathers and compiles include patterns into one matcher."""
+        self.__include_patterns = PatternMatcher(
+            (package, package.include_patterns)
+            for group in self.external_groups.values()
+            for package in group.packages.values())
 
     def locate(self, include, component):
         """Locates the dependency component.
 
+        The location is resolved only once
+        for the same include directives in the same context.
+
         Args:
             include: The include object representing the directive.
             component: The dependent component.
@@ -708,35 +1654,65 @@ class DependencyAnalysis(object):
         Returns:
             True if the include is found.
 
+        Raises:
+            AnalysisError: Failure to associate a header to a component.
+        """
+        key = (include.hfile, include.with_quotes,
+               component.working_dir if include.with_quotes else None)
+        if key in self.__locations:
+            self.locate_hits += 1
+            dep_component = self.__locations[key]
+        else:
+            self.locate_misses += 1
+            dep_component = self.__locate_component(include,
+                                                    component.working_dir)
+            self.__locations[key] = dep_component
+
+        if dep_component is None:
+            return False
+        if dep_component != component:
+            component.dep_components.add(dep_component)
+        return True
+
+    def __locate_component(self, include, working_dir):
+        """Finds the component of the included header.
+
+        Args:
+            include: The include object representing the directive.
+            working_dir: The directory of the dependent component.
+
+        Returns:
+            The internal or external component or None if not found.
+
         Raises:
             AnalysisError: Failure to associate a header to a component.
         """
 
         def _find_external_package(hpath):
-            for path, package in reversed(self.__package_aliases):
-                if path_isancestor(path, hpath):
-                    return package
+            path = hpath
+            while True:  # The most specific alias first.
+                if path in self.__package_aliases:
+                    return self.__package_aliases[path]
+                parent_path = os.path.dirname(path)
+                if parent_path == path:
+                    break
+                path = parent_path
             raise AnalysisError('include error: Cannot associate '
                                 '%s file with any component.' % hpath)
 
-        hpath, package = include.locate(
-            component.working_dir, self.include_dirs, self.__include_patterns)
+        hpath, package = include.find(working_dir, self.include_dirs,
+                                      self.__include_patterns,
+                                      self.file_index.isfile)
 
         if hpath is None:
-            return False
+            return None
         if package is None and hpath in self._internal_components:
-            dep_component = self._internal_components[hpath]
-            if dep_component != component:
-                component.dep_components.add(dep_component)
-        else:
-            if hpath in self._external_components:
-                component.dep_components.add(self._external_components[hpath])
-            else:
-                dep_component = ExternalComponent(
-                    hpath, package or _find_external_package(hpath))
-                component.dep_components.add(dep_component)
-                self._external_components[hpath] = dep_component
-        return True
+            return self._internal_components[hpath]
+        if hpath not in self._external_components:
+            hpath = self.paths.intern(hpath)
+            self._external_components[hpath] = ExternalComponent(
+                hpath, package or _find_external_package(hpath))
+        return self._external_components[hpath]
 
     @property
     def internal_components(self):
@@ -747,78 +1723,290 @@ class DependencyAnalysis(object):
                     yield component
 
     def make_components(self):
-        """Pairs hfiles and cfiles.
+        """Pairs hfiles and cfiles and locates their dependencies.
+
+        The include directives are dropped after the location
+        if the analysis releases them.
 
         Raises:
             AnalysisError: Misconfiguration or failure of the analysis.
         """
-        for group in self.internal_groups.values():
-            for package in group.packages.values():
-                package.construct_components()
+        packages = [
+            package
+            for group in self.internal_groups.values()
+            for package in group.packages.values()
+        ]
+        with profiling.phase('discover'):
+            component_files = [
+                x.find_component_files(self.jobs) for x in packages
+            ]
+        profiling.count('components', sum(len(x) for x in component_files))
+        with profiling.phase('scan'):
+            cache = None
+            if self.cache_dir is not None:
+                cache = FileCache(
+                    os.path.join(self.cache_dir,
+                                 DependencyAnalysis._INCLUDE_CACHE), VERSION)
+            includes = grep_includes(((path, package.scan_limits)
+                                      for package, pairs in zip(
+                                          packages, component_files)
+                                      for pair in pairs
+                                      for path in pair if path), self.jobs,
+                                     cache)
+            if cache is not None:
+                cache.save()
+        with profiling.phase('construct'):
+            for package, pairs in zip(packages, component_files):
+                package.construct_components(pairs, includes, self.paths)
+
+            for component in self.internal_components:
+                id_path = component.hpath or component.cpath
+                self._internal_components[id_path] = component
+                if component.cpath and component.cpath.endswith('.ipp'):
+                    self._internal_components[component.cpath] = component
+
+        with profiling.phase('locate'):
+            for component in self.internal_components:
+                with profiling.span('locate', component.hpath or
+                                    component.cpath):
+                    for include in itertools.chain(component.includes_in_h,
+                                                   component.includes_in_c):
+                        if not self.locate(include, component):
+                            warn('include issues: header not found: %s' %
+                                 str(include))
+        if self.release_includes:
+            for component in self.internal_components:
+                component.release_includes()
+            self.__locations.clear()
+            self.paths = None
+        profiling.count('include resolutions', self.locate_misses)
+        profiling.count('resolution cache hits', self.locate_hits)
+
+    def quotient_dependencies(self):
+        """Gathers dependencies among components, packages, and groups.
+
+        The dependencies of internal components are traversed once.
+        The dependencies outside of a package or a group
+        are aggregated into the dependency package or group.
 
-        for component in self.internal_components:
-            id_path = component.hpath or component.cpath
-            self._internal_components[id_path] = component
-            if component.cpath and component.cpath.endswith('.ipp'):
-                self._internal_components[component.cpath] = component
+        Returns:
+            ({package: [(component, component|package)]},
+             {group: [(package, package|group)]},
+             [(group, group)]) unique dependency edges
+            in the order of internal groups, packages, and components.
+        """
+        component_edges = collections.defaultdict(list)
+        package_edges = collections.defaultdict(list)
+        group_edges = []
+        visited = set()  # Aggregated edges.
+
+        def _add(edges, edge):
+            if edge not in visited:
+                visited.add(edge)
+                edges.append(edge)
 
         for component in self.internal_components:
-            for include in itertools.chain(component.includes_in_h,
-                                           component.includes_in_c):
-                if not self.locate(include, component):
-                    warn('include issues: header not found: %s' % str(include))
+            package = component.package
+            group = package.group
+            for dep in component.dependencies():
+                dep_package = dep.package
+                if dep_package is package:
+                    component_edges[package].append((component, dep))
+                    continue
+                _add(component_edges[package], (component, dep_package))
+                dep_group = dep_package.group
+                if dep_group is group:
+                    _add(package_edges[group], (package, dep_package))
+                else:
+                    _add(package_edges[group], (package, dep_group))
+                    _add(group_edges, (group, dep_group))
+        return component_edges, package_edges, group_edges
 
     def analyze(self, printer, args):
-        """Runs the analysis."""
+        """Runs the analysis.
 
-        def _analyze(graph_name, digraph):
-            digraph.analyze()
-            digraph.print_cycles(printer)
-            if not args.l and not args.L:
-                digraph.print_levels(printer)
-            else:
-                digraph.print_levels(printer, args.l)
-            digraph.print_summary(printer)
-            digraph.write_dot(graph_name)
-
-        if len(self.internal_groups) > 1:
-            printer('\n' + '#' * 80)
-            printer('analyzing dependencies among all package groups ...')
-            _analyze(
-                'system',
-                Graph(self.internal_groups.values(), iter,
-                      lambda x: x.name in self.external_groups))
-
-        for group_name, package_group in self.internal_groups.items():
-            if len(package_group.packages) > 1:
-                printer('\n' + '#' * 80)
-                printer('analyzing dependencies among packages in '
-                        'the specified package group %s ...' % group_name)
-
-                def _dep_filter(nodes):
-                    return (node if node.group == package_group else node.group
-                            for node in nodes)
-
-                _analyze(
-                    group_name,
-                    Graph(package_group.packages.values(), _dep_filter,
-                          lambda x: isinstance(x, PackageGroup)))
-
-        for group_name, package_group in self.internal_groups.items():
-            for pkg_name, package in package_group.packages.items():
-                if not package.components:
-                    assert not package.src_paths
-                    continue
-                printer('\n' + '#' * 80)
+        The graphs are analyzed in parallel worker processes
+        if multiple jobs are requested and the platform can fork.
+        The reports are printed in the same order as in the serial run.
+
+        With the 'jsonl' format of the report,
+        the results of each graph are printed as a JSON record on one line
+        as soon as the graph is analyzed.
+
+        Args:
+            printer: The printer of the report.
+            args: The command-line arguments with the report options
+                ('format', 'graph_format', 'dot_ranks', and 'dot_clusters'
+                default to the command-line defaults if missing).
+        """
+        jobs = _analysis_jobs(self, args)
+        pool = None
+        if self.jobs > 1 and len(jobs) > 1:
+            pool = _fork_pool(min(self.jobs, len(jobs)), _init_analysis_worker,
+                              ([x for _, x in jobs],))
+        if pool is None:
+            for header, job in jobs:
+                _print_analysis_header(printer, args, header)
+                _analyze_graph(printer, *job)
+            return
+        try:
+            _replay_analysis_jobs(printer, args, [x for x, _ in jobs], pool)
+        finally:
+            pool.close()
+            pool.join()
+
+
+_worker_jobs = None  # pylint: disable=invalid-name
+
+
+def _analyze_graph(printer, args, graph_name, nodes, edges, is_external):
+    """Analyzes the graph, prints the report, and writes the graph files.
+
+    Args:
+        printer: The printer of the report.
+        args: The command-line arguments with the report options
+            (see DependencyAnalysis.analyze).
+        graph_name: The name of the graph and its files.
+        nodes: The internal nodes of the graph.
+        edges: The dependency edges of the nodes.
+        is_external: The predicate for external nodes.
+    """
+    with profiling.span('analyze', graph_name):
+        with profiling.phase('graph'):
+            digraph = Graph([], is_external=is_external)
+            digraph.add_nodes_from(nodes)
+            digraph.add_edges_from(edges)
+        digraph.analyze()
+        with profiling.phase('report'):
+            if getattr(args, 'format', 'text') == 'jsonl':
                 printer(
-                    'analyzing dependencies among components in '
-                    'the specified package %s.%s ...' % (group_name, pkg_name))
+                    json.dumps(digraph.to_record(graph_name), sort_keys=True))
+            else:
+                digraph.print_cycles(printer)
+                if not args.l and not args.L:
+                    digraph.print_levels(printer)
+                else:
+                    digraph.print_levels(printer, args.l)
+                digraph.print_summary(printer)
+        graph_format = getattr(args, 'graph_format', ['dot'])
+        if 'dot' in graph_format:
+            with profiling.phase('dot'):
+                digraph.write_dot(graph_name,
+                                  getattr(args, 'dot_ranks', False),
+                                  getattr(args, 'dot_clusters', False))
+        if 'npz' in graph_format:
+            with profiling.phase('npz'):
+                digraph.write_npz(graph_name)
+
+
+def _analysis_jobs(analysis, args):
+    """Gathers the graphs to analyze in the order of the report.
+
+    Args:
+        analysis: The dependency analysis with the located components.
+        args: The command-line arguments with the report options.
+
+    Returns:
+        [(header, (args, graph_name, nodes, edges, is_external))]
+        with the arguments to _analyze_graph after the printer.
+    """
+    with profiling.phase('quotient'):
+        component_edges, package_edges, group_edges = (
+            analysis.quotient_dependencies())
+    jobs = []
+
+    if len(analysis.internal_groups) > 1:
+        jobs.append(('analyzing dependencies among all package groups ...',
+                     (args, 'system', analysis.internal_groups.values(),
+                      group_edges,
+                      lambda x: x.name in analysis.external_groups)))
+
+    for group_name, package_group in analysis.internal_groups.items():
+        if len(package_group.packages) > 1:
+            jobs.append(('analyzing dependencies among packages in '
+                         'the specified package group %s ...' % group_name,
+                         (args, group_name, package_group.packages.values(),
+                          package_edges[package_group],
+                          lambda x: isinstance(x, PackageGroup))))
+
+    for group_name, package_group in analysis.internal_groups.items():
+        for pkg_name, package in package_group.packages.items():
+            if not package.components:
+                assert not package.src_paths
+                continue
+            jobs.append(('analyzing dependencies among components in '
+                         'the specified package %s.%s ...' %
+                         (group_name, pkg_name),
+                         (args, '_'.join((group_name, pkg_name)),
+                          package.components, component_edges[package],
+                          lambda x: isinstance(x, Package))))
+    return jobs
+
+
+def _print_analysis_header(printer, args, header):
+    """Prints the header of the graph analysis in the text report."""
+    if getattr(args, 'format', 'text') == 'text':
+        printer('\n' + '#' * 80)
+        printer(header)
+
+
+def _replay_analysis_jobs(printer, args, headers, pool):
+    """Prints the results of the analysis jobs run by the worker processes.
+
+    The profiles and trace events of the jobs
+    are merged into the active profile and trace of this process.
+
+    Args:
+        printer: The printer of the report.
+        args: The command-line arguments with the report options.
+        headers: The headers of the jobs in the order of the report.
+        pool: The pool of worker processes with the jobs.
+    """
+    profile = profiling.active()
+    trace = profiling.active_trace()
+    for header, (report, job_profile, job_events) in zip(
+            headers, pool.imap(_run_analysis_job, range(len(headers)))):
+        _print_analysis_header(printer, args, header)
+        for printer_args in report:
+            printer(*printer_args)
+        if profile is not None:
+            profile.merge(job_profile)
+        if trace is not None:
+            trace.events.extend(job_events)
+
+
+def _init_analysis_worker(jobs):
+    """Keeps the analysis jobs in the forked worker process.
+
+    The jobs are passed to the worker with the fork
+    because their nodes and predicates cannot be pickled.
+    """
+    global _worker_jobs  # pylint: disable=global-statement,invalid-name
+    _worker_jobs = jobs
+
 
-                def _dep_filter(nodes):
-                    return (node if node.package == package else node.package
-                            for node in nodes)
+def _run_analysis_job(index):
+    """Runs the analysis job kept by the forked worker process.
 
-                _analyze(
-                    '_'.join((group_name, pkg_name)),
-                    Graph(package.components, _dep_filter,
-                          lambda x: isinstance(x, Package)))
+    Returns:
+        (report, profile, events) with the report as the list of arguments
+        to the printer calls, the profile of the job
+        (from Profile.to_dict) if the profile is active,
+        and the trace events of the job if the trace is active.
+    """
+    report = []
+    profile = profiling.active() and profiling.enable()
+    trace = profiling.active_trace() and profiling.enable_trace()
+    _analyze_graph(lambda *x: report.append(x), *_worker_jobs[index])
+    return report, profile and profile.to_dict(), trace and trace.events
+
+
+def _fork_pool(processes, initializer, initargs):
+    """Returns a pool of forked worker processes or None if unsupported."""
+    if not hasattr(os, 'fork'):
+        return None
+    import multiprocessing
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork').Pool(processes, initializer,
+                                                        initargs)
+    return multiprocessing.Pool(processes, initializer, initargs)
@@ -15,24 +15,197 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """Graph algorithms used in Large-Scale C++ Software Design (ch. 4, appendix C).
 
-A Python Graph API? http://wiki.python.org/moin/PythonGraphApi
-It seems that the best one is NetworkX(http://networkx.lanl.gov/).
+The analysis runs on nodes mapped to dense integer ids
+with adjacency in compressed sparse row (CSR) arrays.
+NetworkX(http://networkx.github.io/) is used only to export graphs.
 """
 
 from __future__ import absolute_import, division
 
+import array
+import collections
 import math
+import re
 
-import networkx as nx
-from networkx.drawing.nx_pydot import write_dot
+from . import profiling
+from .npz import write_npz
 
 
-class Graph(object):
-    """Graph for dependency analysis among its nodes.
+_RE_DOT_ID = re.compile(r'(?:[_a-zA-Z][_a-zA-Z0-9]*|'
+                        r'-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))\Z')
+_DOT_KEYWORDS = frozenset(
+    ['node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'])
+
+
+def dot_id(name):
+    """Returns the DOT language ID of the name quoted if necessary."""
+    if _RE_DOT_ID.match(name) and name.lower() not in _DOT_KEYWORDS:
+        return name
+    return '"%s"' % name.replace('"', r'\"').replace('\n', r'\n').replace(
+        '\r', r'\r')
+
+
+def _bit_count(bitset):
+    """Returns the number of set bits in the non-negative integer."""
+    return bin(bitset).count('1')
+
+
+def _strongly_connected_components(offsets, targets):
+    """Finds strongly connected components with iterative Tarjan's algorithm.
 
-    Attributes:
-        digraph: The underlying directed graph without self-loops.
+    Args:
+        offsets: The CSR offsets of node successors in the targets.
+        targets: The CSR successor node ids.
+
+    Returns:
+        (the number of components, [component id by node id]).
+        The components are numbered in the reverse topological order,
+        i.e., edges between components go to lower ids.
     """
+    return _Tarjan(offsets, targets).run()
+
+
+class _Tarjan(object):
+    """The state of the iterative Tarjan's algorithm on CSR adjacency arrays.
+
+    The recursion of the algorithm is replaced with the explicit path
+    of [node, next successor offset] frames.
+    """
+
+    __slots__ = [
+        '__offsets', '__targets', '__node2index', '__lowlink', '__on_stack',
+        '__node2component', '__stack', '__path', '__num_components',
+        '__next_index'
+    ]
+
+    def __init__(self, offsets, targets):
+        """Initializes the state with all the nodes unvisited."""
+        num_nodes = len(offsets) - 1
+        self.__offsets = offsets
+        self.__targets = targets
+        self.__node2index = [-1] * num_nodes
+        self.__lowlink = [0] * num_nodes
+        self.__on_stack = [False] * num_nodes
+        self.__node2component = [-1] * num_nodes
+        self.__stack = []
+        self.__path = []  # [[node, next successor offset]]
+        self.__num_components = 0
+        self.__next_index = 0
+
+    def run(self):
+        """Returns the results of _strongly_connected_components."""
+        for root, index in enumerate(self.__node2index):
+            if index != -1:
+                continue
+            self.__visit(root)
+            while self.__path:
+                self.__advance()
+        return self.__num_components, self.__node2component
+
+    def __visit(self, v):
+        """Puts the new node onto the stack and the path."""
+        self.__node2index[v] = self.__lowlink[v] = self.__next_index
+        self.__next_index += 1
+        self.__stack.append(v)
+        self.__on_stack[v] = True
+        self.__path.append([v, self.__offsets[v]])
+
+    def __advance(self):
+        """Visits the next new successor of the path end or finishes it."""
+        frame = self.__path[-1]
+        v = frame[0]
+        end = self.__offsets[v + 1]
+        node2index = self.__node2index
+        lowlink = self.__lowlink
+        while frame[1] < end:
+            w = self.__targets[frame[1]]
+            frame[1] += 1
+            if node2index[w] == -1:
+                self.__visit(w)
+                return
+            if self.__on_stack[w] and node2index[w] < lowlink[v]:
+                lowlink[v] = node2index[w]
+        self.__path.pop()
+        self.__finish(v)
+
+    def __finish(self, v):
+        """Pops the component of the finished root node from the stack."""
+        lowlink = self.__lowlink
+        if lowlink[v] == self.__node2index[v]:
+            while True:
+                w = self.__stack.pop()
+                self.__on_stack[w] = False
+                self.__node2component[w] = self.__num_components
+                if w == v:
+                    break
+            self.__num_components += 1
+        if self.__path and lowlink[v] < lowlink[self.__path[-1][0]]:
+            lowlink[self.__path[-1][0]] = lowlink[v]
+
+
+def _reduce_successors(successors, descendants, num_pending):
+    """Reduces the successors of a component in the condensed graph.
+
+    The descendant bitsets are released after their last predecessor.
+
+    Args:
+        successors: The successor component ids in the topological order.
+        descendants: {component_id: bitset} of the components
+            with unvisited predecessors.
+        num_pending: [the number of unvisited predecessors] by component id.
+
+    Returns:
+        ([reduced successor], reachable bitset, True if the descendants
+        of the reduced successors are disjoint).
+    """
+    reachable = 0
+    reduced = []
+    is_disjoint = True
+    for v in successors:
+        v_descendants = descendants[v]
+        num_pending[v] -= 1
+        if not num_pending[v]:
+            del descendants[v]
+        if reachable >> v & 1:
+            continue
+        reduced.append(v)
+        if is_disjoint and reachable & v_descendants:
+            is_disjoint = False
+        reachable |= v_descendants
+    return reduced, reachable, is_disjoint
+
+
+class Cycle(object):
+    """A strongly connected subgraph of nodes in a dependency cycle."""
+
+    def __init__(self, nodes, edges):
+        """Initializes the cycle with its member nodes and internal edges."""
+        self.__nodes = nodes
+        self.__edges = edges
+
+    def nodes(self):
+        """Returns the list of member nodes."""
+        return list(self.__nodes)
+
+    def edges(self):
+        """Returns the list of (u, v) edges among the member nodes."""
+        return list(self.__edges)
+
+    def number_of_nodes(self):
+        """Returns the number of member nodes."""
+        return len(self.__nodes)
+
+    def number_of_edges(self):
+        """Returns the number of edges among the member nodes."""
+        return len(self.__edges)
+
+    def __iter__(self):
+        """Iterates over the member nodes."""
+        return iter(self.__nodes)
+
+
+class Graph(object):
+    """Graph for dependency analysis among its nodes."""
 
     def __init__(self, nodes, dep_filter=iter, is_external=lambda _: False):
         """Constructs a digraph for dependency analysis.
@@ -47,135 +220,227 @@ class Graph(object):
             dep_filter: A filter for node dependencies.
             is_external: Predicate to determine if a Graph node is external.
         """
-        self.digraph = nx.DiGraph()
-        self.cycles = {}  # {cyclic_graph: ([pre_edge], [suc_edge])}
-        self.cycle2index = {}  # {cyclic_graph: cycle_index}
-        self.node2cycle = {}  # {node: cyclic_graph}
+        self.cycles = {}  # {cycle: ([pre_edge], [suc_edge])}
+        self.cycle2index = {}  # {cycle: cycle_index}
+        self.node2cycle = {}  # {node: cycle}
         self.node2cd = {}  # {node: cd}
         self.node2level = {}  # {node: level}
-        self.__dep_filter = dep_filter
         self.__is_external = is_external
+        self.__nodes = []  # [node] by node id.
+        self.__node2id = {}
+        self.__successors = []  # [[successor_id]] by node id.
+        self.__edges = set()  # {(u_id, v_id)}
+        self.__node2component = None  # [component_id] by node id.
+        self.__reduced = None  # [set(successor_component_id)]
+        for node in nodes:
+            self.add_nodes_from([node])
+            self.add_edges_from(
+                (node, x) for x in dep_filter(node.dependencies()))
+
+    def __add_node(self, node):
+        """Returns the id of the node added if new."""
+        node_id = self.__node2id.get(node)
+        if node_id is None:
+            node_id = self.__node2id[node] = len(self.__nodes)
+            self.__nodes.append(node)
+            self.__successors.append([])
+        return node_id
+
+    def add_nodes_from(self, nodes):
+        """Adds internal nodes before the analysis."""
+        assert self.__reduced is None
         for node in nodes:
             assert not self.__is_external(node)
-            self.digraph.add_node(node)
-            for dependency in self.__dep_filter(node.dependencies()):
-                assert node != dependency
-                self.digraph.add_edge(node, dependency)
-
-    # pylint: disable=invalid-name
-    def __transitive_reduction(self):
-        """Transitive reduction for acyclic graphs."""
-        assert nx.is_directed_acyclic_graph(self.digraph)
-        for u in self.digraph:
-            transitive_vertex = []
-            for v in self.digraph[u]:
-                transitive_vertex.extend(
-                    x for _, x in nx.dfs_edges(self.digraph, v))
-            self.digraph.remove_edges_from((u, x) for x in transitive_vertex)
-
-    def __condensation(self):
-        """Produces condensation of cyclic graphs."""
-        subgraphs = nx.strongly_connected_component_subgraphs(self.digraph)
-        for subgraph in list(subgraphs):
-            if subgraph.number_of_nodes() == 1:
-                continue  # not a cycle
-            pre_edges = []
-            suc_edges = []
-            for node in subgraph:
-                assert node not in self.node2cycle
-                assert node in self.digraph  # no accidental copying
-                self.node2cycle[node] = subgraph
-                for pre_node in self.digraph.predecessors(node):
-                    if not subgraph.has_node(pre_node):
-                        pre_edges.append((pre_node, node))
-                        self.digraph.add_edge(pre_node, subgraph)
-                for suc_node in self.digraph.successors(node):
-                    if not subgraph.has_node(suc_node):
-                        suc_edges.append((node, suc_node))
-                        self.digraph.add_edge(subgraph, suc_node)
-                self.digraph.remove_node(node)
-            assert subgraph not in self.cycles
-            self.cycles[subgraph] = (pre_edges, suc_edges)
-
-        cycle_order = lambda x: min(str(u) for u in x)
-        for index, cycle in enumerate(sorted(self.cycles, key=cycle_order)):
-            self.cycle2index[cycle] = index
-
-    # pylint: disable=invalid-name
-    def __decondensation(self):
-        """Reverts the effect of the condensation."""
-        for subgraph, (pre_edges, suc_edges) in self.cycles.items():
-            assert self.digraph.has_node(subgraph)
-            for u, v in pre_edges:
-                if (self.digraph.has_edge(u, subgraph) or
-                    (u in self.node2cycle and
-                     self.digraph.has_edge(self.node2cycle[u], subgraph))):
-                    self.digraph.add_edge(u, v)
-            for u, v in suc_edges:
-                if (self.digraph.has_edge(subgraph, v) or
-                    (v in self.node2cycle and
-                     self.digraph.has_edge(subgraph, self.node2cycle[v]))):
-                    self.digraph.add_edge(u, v)
-            self.digraph.add_nodes_from(subgraph)
-            self.digraph.add_edges_from(subgraph.edges())
-            self.digraph.remove_node(subgraph)
+            self.__add_node(node)
+
+    def add_edges_from(self, edges):
+        """Adds dependency edges (u, v) between nodes before the analysis."""
+        assert self.__reduced is None
+        for u, v in edges:
+            assert u != v
+            edge = (self.__add_node(u), self.__add_node(v))
+            if edge not in self.__edges:
+                self.__edges.add(edge)
+                self.__successors[edge[0]].append(edge[1])
+
+    def __successor_ids(self, node_id):
+        """Returns ids of successors in the (reduced after analysis) graph."""
+        if self.__reduced is None:
+            return self.__successors[node_id]
+        component = self.__node2component[node_id]
+        reduced = self.__reduced[component]
+        return [
+            x for x in self.__successors[node_id]
+            if self.__node2component[x] == component or
+            self.__node2component[x] in reduced
+        ]
+
+    def to_networkx(self):
+        """Exports the graph into a new NetworkX directed graph.
+
+        Returns:
+            The NetworkX directed graph without self-loops
+            (reduced after the analysis).
+        """
+        import networkx as nx
+        digraph = nx.DiGraph()
+        digraph.add_nodes_from(self.__nodes)
+        for node_id, node in enumerate(self.__nodes):
+            digraph.add_edges_from((node, self.__nodes[x])
+                                   for x in self.__successor_ids(node_id))
+        return digraph
 
     def analyze(self):
         """Applies transitive reduction to the graph and calculates metrics.
 
         If the graph contains cycles,
-        the graph is minimized instead.
+        the graph is minimized instead:
+        the reduction applies to the edges among the cycles and other nodes,
+        and the edges inside cycles are kept.
+        """
+        with profiling.phase('scc'):
+            offsets = array.array('l', [0])
+            targets = array.array('l')
+            for successors in self.__successors:
+                targets.extend(successors)
+                offsets.append(len(targets))
+            num_components, self.__node2component = (
+                _strongly_connected_components(offsets, targets))
+        with profiling.phase('condense'):
+            components = self.__condensation(num_components)
+        with profiling.phase('reduce'):
+            self.__reduce_and_measure(components)
+        profiling.count('graphs')
+        profiling.count('graph nodes', len(self.__nodes))
+        profiling.count('graph edges', len(targets))
+        profiling.count('cycles', len(self.cycles))
+
+    def __condensation(self, num_components):
+        """Gathers cycles and condensed nodes of components.
+
+        Returns:
+            [node | cycle] by component id.
         """
-        assert self.digraph.number_of_selfloops() == 0
-        self.__condensation()
-        self.__transitive_reduction()
-        self.__calculate_ccd()
-        self.__calculate_levels()
-        self.__decondensation()
+        members = [[] for _ in range(num_components)]
+        for node_id, component in enumerate(self.__node2component):
+            members[component].append(node_id)
+        components = [
+            self.__nodes[x[0]] if len(x) == 1 else self.__add_cycle(x)
+            for x in members
+        ]
+
+        for u, successors in enumerate(self.__successors):
+            for v in successors:
+                cycle = self.node2cycle.get(self.__nodes[v])
+                if cycle is not None and self.node2cycle.get(
+                        self.__nodes[u]) is not cycle:
+                    self.cycles[cycle][0].append((self.__nodes[u],
+                                                  self.__nodes[v]))
 
-    def __calculate_ccd(self):
-        """Calculates CCD for nodes.
+        cycle_order = lambda x: min(str(u) for u in x)
+        for index, cycle in enumerate(sorted(self.cycles, key=cycle_order)):
+            self.cycle2index[cycle] = index
+        return components
 
-        The graph must be minimized with condensed cycles.
+    def __add_cycle(self, node_ids):
+        """Adds the cycle of the component nodes with its successor edges.
+
+        Returns:
+            The new cycle.
         """
-        descendants = {}  # {node: set(descendant_node)} for memoization.
-
-        def _get_descendants(node):
-            """Returns a set of descendants of a node."""
-            if node not in descendants:
-                node_descendants = set()
-                for v in self.digraph[node]:
-                    node_descendants.add(v)
-                    node_descendants.update(_get_descendants(v))
-                descendants[node] = node_descendants
-            return descendants[node]
-
-        def _get_cd(node):
-            """Returns CD contribution of a node."""
-            if self.__is_external(node):
-                return 0
-            return 1 if node not in self.cycles else node.number_of_nodes()
-
-        for node in self.digraph:
-            cd = _get_cd(node)
-            for descendant in _get_descendants(node):
-                cd += _get_cd(descendant)
-            self.node2cd[node] = cd
-
-    def __calculate_levels(self):
-        """Calculates levels for nodes."""
-
-        def _get_level(node):
-            if node not in self.node2level:
-                level = (not self.__is_external(node)
-                         if node not in self.cycles else node.number_of_nodes())
-                if self.digraph[node]:
-                    level += max(_get_level(x) for x in self.digraph[node])
-                self.node2level[node] = level
-            return self.node2level[node]
-
-        for node in self.digraph:
-            _get_level(node)
+        component = self.__node2component[node_ids[0]]
+        edges = []
+        suc_edges = []
+        for u in node_ids:
+            for v in self.__successors[u]:
+                edge = (self.__nodes[u], self.__nodes[v])
+                if self.__node2component[v] == component:
+                    edges.append(edge)
+                else:
+                    suc_edges.append(edge)
+        cycle = Cycle([self.__nodes[x] for x in node_ids], edges)
+        for node in cycle:
+            self.node2cycle[node] = cycle
+        self.cycles[cycle] = ([], suc_edges)
+        return cycle
+
+    def __reduce_and_measure(self, components):
+        """Reduces the condensed graph and calculates levels and CCD.
+
+        The components are swept in the reverse topological order
+        with their descendants kept as integer bitsets over component ids.
+        The successors of a component are visited in the topological order,
+        so an edge is redundant
+        if its target is already reachable from the preceding successors.
+        The bitset of a component is released
+        as soon as all its predecessors have been visited.
+
+        The CD of a component is the sum of CD contributions
+        of the component and its descendants.
+        If the descendants of its successors are disjoint,
+        the CD of the successors are summed;
+        otherwise, the descendant bitset is counted per CD contribution.
+
+        Args:
+            components: [node | cycle] by component id.
+        """
+        num_components = len(components)
+        successors, num_pending = self.__condensed_successors(num_components)
+        weights = [self.__get_cd(x) for x in components]
+        weight2mask = collections.defaultdict(int)  # {weight: bitset}
+        for component, weight in enumerate(weights):
+            if weight:
+                weight2mask[weight] |= 1 << component
+        weight2mask = list(weight2mask.items())
+
+        levels = [0] * num_components
+        cds = [0] * num_components
+        self.__reduced = []
+        descendants = {}  # {component_id: bitset}
+        for component in range(num_components):
+            reduced, reachable, is_disjoint = _reduce_successors(
+                sorted(successors[component], reverse=True), descendants,
+                num_pending)
+            reachable |= 1 << component
+            if is_disjoint:
+                cds[component] = weights[component] + sum(
+                    cds[x] for x in reduced)
+            else:
+                cds[component] = sum(weight * _bit_count(reachable & mask)
+                                     for weight, mask in weight2mask)
+            levels[component] = weights[component] + max(
+                [0] + [levels[x] for x in reduced])
+            node = components[component]
+            self.node2level[node] = levels[component]
+            self.node2cd[node] = cds[component]
+            self.__reduced.append(set(reduced))
+            if num_pending[component]:
+                descendants[component] = reachable
+
+    def __condensed_successors(self, num_components):
+        """Returns the successors and the number of predecessors of components.
+
+        Returns:
+            ([set(successor_id)], [the number of predecessors])
+            by component id.
+        """
+        successors = [set() for _ in range(num_components)]
+        for u, node_successors in enumerate(self.__successors):
+            component = self.__node2component[u]
+            successors[component].update(
+                x for x in (self.__node2component[v] for v in node_successors)
+                if x != component)
+        num_predecessors = [0] * num_components
+        for component_successors in successors:
+            for v in component_successors:
+                num_predecessors[v] += 1
+        return successors, num_predecessors
+
+    def __get_cd(self, node):
+        """Returns the CD contribution and the level increment of a node."""
+        if node in self.cycles:
+            return node.number_of_nodes()
+        return 0 if self.__is_external(node) else 1
 
     def get_level(self, node):
         """Returns the level of the component node."""
@@ -222,10 +487,12 @@ class Graph(object):
             """Prints dependencies of the levelized components."""
             if reduced_dependencies is None or self.__is_external(node):
                 return
-            for v in sorted(
-                    self.digraph[node] if reduced_dependencies else set(
-                        self.__dep_filter(node.dependencies())),
-                    key=lambda x: (self.get_level(x), str(x))):
+            node_id = self.__node2id[node]
+            successor_ids = (self.__successor_ids(node_id)
+                             if reduced_dependencies else
+                             self.__successors[node_id])
+            for v in sorted((self.__nodes[x] for x in successor_ids),
+                            key=lambda x: (self.get_level(x), str(x))):
                 if v in self.node2cycle:
                     cycle = self.node2cycle[v]
                     printer('\t\t%d. %s <%d>' % (self.node2level[cycle], str(v),
@@ -249,31 +516,169 @@ class Graph(object):
                 printer('\t' + str(node))
                 _print_dependencies(node)
 
-    def print_summary(self, printer):
-        """Calculates and prints overall CCD metrics."""
+    def summary(self):
+        """Calculates overall metrics after the analysis.
+
+        Returns:
+            A dictionary with the number of components, cycles, and levels,
+            and CCD, ACCD, and NCCD.
+        """
         ccd = 0
         for node, cd in self.node2cd.items():
             if node in self.cycles:
                 ccd += node.number_of_nodes() * cd
             else:
                 ccd += cd
-        num_nodes = len([x for x in self.digraph if not self.__is_external(x)])
-        average_cd = ccd / num_nodes
+        num_nodes = len(
+            [x for x in self.__nodes if not self.__is_external(x)])
         # CCD_Balanced_BTree = (N + 1) * log2(N + 1) - N
         ccd_btree = (num_nodes + 1) * math.log(num_nodes + 1, 2) - num_nodes
-        normalized_ccd = ccd / ccd_btree
+        return {
+            'components': num_nodes,
+            'cycles': len(self.cycles),
+            'levels': max(self.node2level.values()),
+            'ccd': ccd,
+            'accd': ccd / num_nodes,
+            'nccd': ccd / ccd_btree
+        }
+
+    def print_summary(self, printer):
+        """Calculates and prints overall CCD metrics."""
+        summary = self.summary()
         printer('=' * 80)
         printer('SUMMARY:')
         printer('Components: %d\t Cycles: %d\t Levels: %d' %
-                (num_nodes, len(self.cycles), max(self.node2level.values())))
+                (summary['components'], summary['cycles'], summary['levels']))
         typical_range = '[0.85, 1.10]'
         printer('CCD: %d\t ACCD: %.2f\t NCCD: %.2f (typical range is %s)' %
-                (ccd, average_cd, normalized_ccd, typical_range))
+                (summary['ccd'], summary['accd'], summary['nccd'],
+                 typical_range))
+
+    def to_record(self, name):
+        """Returns the analysis results as a JSON-compatible record.
+
+        Nodes are identified by their string names.
+
+        Args:
+            name: The name of the graph.
 
-    def write_dot(self, file_basename):
+        Returns:
+            A dictionary with the graph name, nodes with levels, CDs,
+            and cycle indices (None if not in cycles),
+            cycles with their nodes and edges,
+            reduced and unreduced edges, and summary metrics.
+        """
+        names = [str(x) for x in self.__nodes]
+        nodes = []
+        for node_id, node in enumerate(self.__nodes):
+            cycle = self.node2cycle.get(node)
+            nodes.append({
+                'name': names[node_id],
+                'level': self.get_level(node),
+                'cd': self.node2cd[node if cycle is None else cycle],
+                'cycle': None if cycle is None else self.cycle2index[cycle],
+                'external': bool(self.__is_external(node))
+            })
+        nodes.sort(key=lambda x: (x['level'], x['name']))
+        cycles = [{
+            'index': index,
+            'nodes': sorted(str(x) for x in cycle),
+            'edges': sorted([str(u), str(v)] for u, v in cycle.edges())
+        } for cycle, index in sorted(
+            self.cycle2index.items(), key=lambda x: x[1])]
+
+        def _edges(get_successor_ids):
+            return sorted([names[u], names[v]]
+                          for u in range(len(self.__nodes))
+                          for v in get_successor_ids(u))
+
+        return {
+            'graph': name,
+            'nodes': nodes,
+            'cycles': cycles,
+            'edges': _edges(self.__successor_ids),
+            'unreduced_edges': _edges(lambda x: self.__successors[x]),
+            'summary': self.summary()
+        }
+
+    def write_dot(self, file_basename, ranks=False, clusters=False):
         """Writes graph into a file in Graphviz DOT format.
 
+        Nodes and edges are streamed into the file
+        in the order of the NetworkX export with pydot.
+
+        Args:
+            file_basename: The output file name without extension.
+            ranks: Place nodes of the same level at the same rank
+                (requires the analysis).
+            clusters: Place nodes of cycles into clusters
+                (requires the analysis).
+        """
+        assert self.__reduced is not None or not (ranks or clusters)
+        ids = [dot_id(str(x)) for x in self.__nodes]
+        with open(file_basename + '.dot', 'w') as dot_file:
+            dot_file.write('strict digraph {\n')
+            dot_file.writelines('%s;\n' % x for x in ids)
+            for node_id, node_dot_id in enumerate(ids):
+                dot_file.writelines('%s -> %s;\n' % (node_dot_id, ids[x])
+                                    for x in self.__successor_ids(node_id))
+            if clusters:
+                for cycle, index in sorted(
+                        self.cycle2index.items(), key=lambda x: x[1]):
+                    dot_file.write('subgraph cluster_%d {\n' % index)
+                    if ranks:
+                        dot_file.write('rank=same;\n')
+                    dot_file.writelines('%s;\n' % ids[self.__node2id[x]]
+                                        for x in cycle)
+                    dot_file.write('}\n')
+            if ranks:
+                level2ids = collections.defaultdict(list)
+                for node_id, node in enumerate(self.__nodes):
+                    if not clusters or node not in self.node2cycle:
+                        level2ids[self.get_level(node)].append(ids[node_id])
+                for level in sorted(level2ids):
+                    dot_file.write('{\nrank=same;\n')
+                    dot_file.writelines('%s;\n' % x for x in level2ids[level])
+                    dot_file.write('}\n')
+            dot_file.write('}\n')
+
+    def write_npz(self, file_basename):
+        """Writes the analyzed graph into a file in NumPy .npz format.
+
+        The node table is stored in columns indexed by node ids:
+        'names' (UTF-8 byte strings), 'levels', 'cds',
+        'cycles' (cycle indices or -1), and 'external' (booleans).
+        The reduced and unreduced edges are stored
+        as (E, 2) arrays of node ids in 'edges' and 'unreduced_edges'.
+
         Args:
             file_basename: The output file name without extension.
         """
-        write_dot(self.digraph, file_basename + '.dot')
+        assert self.__reduced is not None
+        levels = array.array('i')
+        cds = array.array('l')
+        cycles = array.array('i')
+        external = bytearray()
+        for node in self.__nodes:
+            cycle = self.node2cycle.get(node)
+            levels.append(self.get_level(node))
+            cds.append(self.node2cd[node if cycle is None else cycle])
+            cycles.append(-1 if cycle is None else self.cycle2index[cycle])
+            external.append(bool(self.__is_external(node)))
+
+        def _edges(get_successor_ids):
+            edges = array.array('i')
+            for u in range(len(self.__nodes)):
+                for v in get_successor_ids(u):
+                    edges.extend((u, v))
+            return edges
+
+        def _encode(name):
+            return name if isinstance(name, bytes) else name.encode('utf-8')
+
+        write_npz(file_basename + '.npz', [
+            ('names', [_encode(str(x)) for x in self.__nodes]),
+            ('levels', levels), ('cds', cds), ('cycles', cycles),
+            ('external', external), ('edges', _edges(self.__successor_ids), 2),
+            ('unreduced_edges', _edges(lambda x: self.__successors[x]), 2)
+        ])
@@ -0,0 +1,127 @@
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Reading and writing of NumPy .npz archives without NumPy.
+
+The archives are zip files of one-dimensional or two-dimensional
+arrays in the NumPy .npy format version 1.0,
+which can be loaded with numpy.load.
+Integer arrays are array.array objects in the native byte order,
+boolean arrays are bytearray objects,
+and byte string arrays are lists of bytes.
+"""
+
+from __future__ import absolute_import
+
+import array
+import ast
+import struct
+import sys
+import zipfile
+
+_MAGIC = b'\x93NUMPY\x01\x00'  # The .npy format version 1.0.
+_ALIGNMENT = 64  # The alignment of the array data after the header.
+_BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
+
+def _header(descr, shape):
+    """Returns the .npy header for the array data type and shape."""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%s), }" % (
+        descr, ''.join('%d,' % x for x in shape))
+    padding = -(len(_MAGIC) + 2 + len(header) + 1) % _ALIGNMENT
+    header += ' ' * padding + '\n'
+    return _MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def _to_npy(value, columns):
+    """Returns the .npy file content of the array value."""
+    if isinstance(value, array.array):
+        assert value.typecode in 'bhilq'
+        descr = '%si%d' % (_BYTE_ORDER, value.itemsize)
+        data = value.tostring() if sys.version[0] == '2' else value.tobytes()
+        size = len(value)
+    elif isinstance(value, bytearray):
+        descr = '|b1'
+        data = bytes(value)
+        size = len(value)
+    else:
+        width = max([len(x) for x in value] or [1]) or 1
+        descr = '|S%d' % width
+        data = b''.join(x.ljust(width, b'\0') for x in value)
+        size = len(value)
+    assert size % columns == 0
+    shape = (size,) if columns == 1 else (size // columns, columns)
+    return _header(descr, shape) + data
+
+
+def write_npz(file_path, arrays):
+    """Writes arrays into a compressed .npz file.
+
+    Args:
+        file_path: The path to the output file.
+        arrays: [(name, value)] or [(name, value, columns)]
+            with the number of columns for two-dimensional arrays
+            stored row by row in the flat value.
+    """
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as npz_file:
+        for entry in arrays:
+            name, value = entry[:2]
+            columns = entry[2] if len(entry) > 2 else 1
+            npz_file.writestr(name + '.npy', _to_npy(value, columns))
+
+
+def _from_npy(content):
+    """Returns the flat value and shape of the .npy file content."""
+    assert content.startswith(_MAGIC[:-2]), 'Not an .npy file.'
+    header_length = struct.unpack('<H', content[8:10])[0]
+    header = ast.literal_eval(content[10:10 + header_length].decode('latin1'))
+    assert not header['fortran_order']
+    data = content[10 + header_length:]
+    descr = header['descr']
+    if descr == '|b1':
+        return bytearray(data), header['shape']
+    if descr.startswith('|S'):
+        width = int(descr[2:])
+        return [
+            data[i:i + width].rstrip(b'\0')
+            for i in range(0, len(data), width)
+        ], header['shape']
+    assert descr[1] == 'i', 'Unsupported data type %s.' % descr
+    typecode = [
+        x for x in 'bhilq'
+        if x in getattr(array, 'typecodes', 'bhil') and
+        array.array(x).itemsize == int(descr[2:])
+    ][0]
+    value = array.array(typecode)
+    if sys.version[0] == '2':
+        value.fromstring(data)
+    else:
+        value.frombytes(data)
+    if descr[0] != _BYTE_ORDER and value.itemsize > 1:
+        value.byteswap()
+    return value, header['shape']
+
+
+def read_npz(file_path):
+    """Reads arrays from an .npz file written by write_npz.
+
+    Args:
+        file_path: The path to the .npz file.
+
+    Returns:
+        {name: (flat_value, shape)}
+    """
+    with zipfile.ZipFile(file_path) as npz_file:
+        return dict((x[:-len('.npy')], _from_npy(npz_file.read(x)))
+                    for x in npz_file.namelist())
@@ -0,0 +1,263 @@
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Wall times and counters of the analysis phases.
+
+The profile and the trace are disabled by default,
+and the instrumentation reduces to a check of the active profile and trace:
+
+    with profiling.phase('scan'):
+        with profiling.span('scan', file_path):
+            ...
+    profiling.count('files scanned', len(files))
+
+Phases are recorded in the profile and the trace,
+and spans of individual files, components, and graphs
+are recorded only in the trace.
+The trace is written in the Chrome trace-event JSON format
+that can be opened in chrome://tracing or Perfetto UI.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import json
+import os
+import threading
+import time
+import timeit
+
+_active = None  # pylint: disable=invalid-name
+_active_trace = None  # pylint: disable=invalid-name
+
+
+class _NullTimer(object):
+    """The timer of phases with the disabled profile."""
+
+    __slots__ = []
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    """The timer of a phase adding the wall time to the profile."""
+
+    __slots__ = ['__profile', '__name', '__start']
+
+    def __init__(self, profile, name):
+        self.__profile = profile
+        self.__name = name
+        self.__start = None
+
+    def __enter__(self):
+        self.__start = timeit.default_timer()
+
+    def __exit__(self, *args):
+        self.__profile.add_time(self.__name,
+                                timeit.default_timer() - self.__start)
+
+
+class _Span(object):
+    """The span of a complete event in the trace."""
+
+    __slots__ = ['__trace', '__category', '__name', '__timer', '__start']
+
+    def __init__(self, trace, category, name, timer=None):
+        self.__trace = trace
+        self.__category = category
+        self.__name = name
+        self.__timer = timer or _NULL_TIMER
+        self.__start = None
+
+    def __enter__(self):
+        self.__timer.__enter__()
+        self.__start = time.time()
+
+    def __exit__(self, *args):
+        end = time.time()
+        self.__timer.__exit__(*args)
+        self.__trace.add(self.__category, self.__name, self.__start, end)
+
+
+class Profile(object):
+    """Wall times of phases and counters in the order of first records.
+
+    Attributes:
+        phases: {name: [seconds, calls]}
+        counters: {name: value}
+    """
+
+    def __init__(self):
+        """Initializes an empty profile."""
+        self.phases = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+
+    def add_time(self, name, seconds, calls=1):
+        """Adds the wall time of the phase calls."""
+        record = self.phases.setdefault(name, [0.0, 0])
+        record[0] += seconds
+        record[1] += calls
+
+    def count(self, name, value=1):
+        """Increments the counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        """Returns the JSON-compatible profile."""
+        return {
+            'phases': [{
+                'name': name,
+                'seconds': seconds,
+                'calls': calls
+            } for name, (seconds, calls) in self.phases.items()],
+            'counters': [{
+                'name': name,
+                'value': value
+            } for name, value in self.counters.items()]
+        }
+
+    def merge(self, profile_dict):
+        """Adds the times and counters of the profile from to_dict."""
+        for phase in profile_dict['phases']:
+            self.add_time(phase['name'], phase['seconds'], phase['calls'])
+        for counter in profile_dict['counters']:
+            self.count(counter['name'], counter['value'])
+
+    def print_table(self, printer):
+        """Prints the summary table of phases and counters."""
+        total = sum(x for x, _ in self.phases.values())
+        printer('%-24s %12s %8s %8s' % ('phase', 'time (ms)', '%', 'calls'))
+        for name, (seconds, calls) in self.phases.items():
+            printer('%-24s %12.1f %8.1f %8d' %
+                    (name, 1000 * seconds, 100 * seconds / (total or 1), calls))
+        printer('%-24s %12.1f' % ('total', 1000 * total))
+        printer('')
+        printer('%-24s %12s' % ('counter', 'value'))
+        for name, value in self.counters.items():
+            printer('%-24s %12d' % (name, value))
+
+
+class Trace(object):
+    """Complete events of spans in the Chrome trace-event format.
+
+    The timestamps are wall clock microseconds
+    comparable across worker processes.
+
+    Attributes:
+        events: [event] JSON-compatible trace events.
+    """
+
+    def __init__(self):
+        """Initializes an empty trace."""
+        self.events = []
+
+    def add(self, category, name, start, end):
+        """Adds the complete event of the span.
+
+        Args:
+            category: The category of the span, e.g., the phase.
+            name: The name of the span, e.g., the file path.
+            start: The start time (s) since the epoch.
+            end: The end time (s) since the epoch.
+        """
+        # The end is rounded as the start to keep nested spans inside.
+        timestamp = int(start * 1e6)
+        self.events.append({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': timestamp,
+            'dur': int(end * 1e6) - timestamp,
+            'pid': os.getpid(),
+            'tid': threading.current_thread().ident
+        })
+
+    def write(self, file_path):
+        """Writes the trace into the JSON file."""
+        with open(file_path, 'w') as json_file:
+            json.dump({
+                'traceEvents': self.events,
+                'displayTimeUnit': 'ms'
+            }, json_file)
+
+
+def enable():
+    """Activates a new profile and returns it."""
+    global _active  # pylint: disable=global-statement,invalid-name
+    _active = Profile()
+    return _active
+
+
+def disable():
+    """Deactivates the profile and returns it (None if not enabled)."""
+    global _active  # pylint: disable=global-statement,invalid-name
+    profile, _active = _active, None
+    return profile
+
+
+def active():
+    """Returns the active profile or None."""
+    return _active
+
+
+def enable_trace():
+    """Activates a new trace and returns it."""
+    global _active_trace  # pylint: disable=global-statement,invalid-name
+    _active_trace = Trace()
+    return _active_trace
+
+
+def disable_trace():
+    """Deactivates the trace and returns it (None if not enabled)."""
+    global _active_trace  # pylint: disable=global-statement,invalid-name
+    trace, _active_trace = _active_trace, None
+    return trace
+
+
+def active_trace():
+    """Returns the active trace or None."""
+    return _active_trace
+
+
+def phase(name):
+    """Returns the context manager timing the phase.
+
+    The phase is recorded in the active profile and trace.
+    """
+    if _active_trace is not None:
+        return _Span(_active_trace, 'phase', name,
+                     _active and _Timer(_active, name))
+    if _active is None:
+        return _NULL_TIMER
+    return _Timer(_active, name)
+
+
+def span(category, name):
+    """Returns the context manager recording the span in the active trace."""
+    if _active_trace is None:
+        return _NULL_TIMER
+    return _Span(_active_trace, category, name)
+
+
+def count(name, value=1):
+    """Increments the counter of the active profile."""
+    if _active is not None:
+        _active.count(name, value)
@@ -20,11 +20,10 @@ setup(
     license="GPLv3+",
     install_requires=[
         "networkx",
-        "pydot",
-        "pydotplus",
         "PyYAML",
         "PyKwalify>=1.6.0"
     ],
+    extras_require={"pydot": ["pydot", "pydotplus"]},
     keywords=["c++", "c", "static analysis", "dependency analysis"],
     url="http://github.com/rakhimov/cppdep",
     packages=["cppdep"],
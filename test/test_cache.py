@@ -0,0 +1,129 @@
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the persistent cache of file processing results."""
+
+from __future__ import absolute_import
+
+import os
+
+import pytest
+
+from cppdep.cache import FileCache, content_digest, load_value, save_value
+
+#pylint: disable=redefined-outer-name
+
+@pytest.fixture()
+def cache_setup(tmpdir):
+    """Sets up a source file with its value in the saved cache."""
+    src = tmpdir.join('src.cc')
+    src.write('#include <vector>')
+    cache_file = str(tmpdir.join('cache', 'cache.json'))
+    cache = FileCache(cache_file, '1.0')
+    assert cache.get(str(src)) is None
+    cache.put(str(src), [['vector', False]])
+    cache.save()
+    return src, cache_file
+
+
+def test_cache_hit(cache_setup):
+    """Unchanged files are retrieved from the cache."""
+    src, cache_file = cache_setup
+    cache = FileCache(cache_file, '1.0')
+    assert len(cache) == 1
+    assert cache.get(str(src)) == [['vector', False]]
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_cache_touched(cache_setup):
+    """Files with only modification time change are valid in the cache."""
+    src, cache_file = cache_setup
+    stat = os.stat(str(src))
+    os.utime(str(src), (stat.st_atime, stat.st_mtime + 10))
+    cache = FileCache(cache_file, '1.0')
+    assert cache.get(str(src)) == [['vector', False]]
+
+
+def test_cache_modified(cache_setup):
+    """Modified files are outdated in the cache."""
+    src, cache_file = cache_setup
+    src.write('#include <string>')
+    cache = FileCache(cache_file, '1.0')
+    assert cache.get(str(src)) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_cache_version(cache_setup):
+    """The cache from a different version is discarded."""
+    src, cache_file = cache_setup
+    cache = FileCache(cache_file, '2.0')
+    assert not cache
+    assert cache.get(str(src)) is None
+
+
+def test_cache_format(cache_setup, monkeypatch):
+    """The cache with a different layout of entries is discarded."""
+    src, cache_file = cache_setup
+    monkeypatch.setattr(FileCache, '_FORMAT', FileCache._FORMAT + 1)
+    cache = FileCache(cache_file, '1.0')
+    assert not cache
+    assert cache.get(str(src)) is None
+
+
+def test_cache_prefix_digest(tmpdir):
+    """Values depending on the file start are valid with the same start."""
+    src = tmpdir.join('src.cc')
+    src.write('#include <vector>\nint x;')
+    cache_file = str(tmpdir.join('cache.json'))
+    cache = FileCache(cache_file, '1.0')
+    cache.put(str(src), ['vector'], [5, content_digest(b'#incl')])
+    cache.save()
+    for text, value in (('#include <vector>\nint y;', ['vector']),
+                        ('#define  <vector>\nint y;', None)):
+        src.write(text)
+        stat = os.stat(str(src))
+        os.utime(str(src), (stat.st_atime, stat.st_mtime + 10))
+        assert FileCache(cache_file, '1.0').get(str(src)) == value
+
+
+def test_cache_eviction(cache_setup, tmpdir):
+    """Entries of deleted files are evicted from the cache."""
+    src, cache_file = cache_setup
+    other = tmpdir.join('other.cc')
+    other.write('')
+    cache = FileCache(cache_file, '1.0')
+    cache.put(str(other), [])
+    cache.save()
+    src.remove()
+    cache = FileCache(cache_file, '1.0')
+    assert len(cache) == 2
+    cache.save()
+    assert len(FileCache(cache_file, '1.0')) == 1
+
+
+def test_cache_corrupted(tmpdir):
+    """Malformed cache files are ignored."""
+    cache_file = tmpdir.join('cache.json')
+    cache_file.write('{')
+    assert not FileCache(str(cache_file), '1.0')
+
+
+def test_cache_value(tmpdir):
+    """Values are loaded only with the same stamp."""
+    cache_file = str(tmpdir.join('cache', 'value.json'))
+    assert load_value(cache_file, [1, 'a']) is None
+    save_value(cache_file, [1, 'a'], {'key': ['value']})
+    assert load_value(cache_file, [1, 'a']) == {'key': ['value']}
+    assert load_value(cache_file, [1, 'b']) is None
@@ -17,15 +17,23 @@
 
 from __future__ import absolute_import
 
+import argparse
+import collections
+import fnmatch
+import itertools
+import json
 import os
 import platform
-import re
+import random
+import subprocess
+import sys
 
 import mock
 import pytest
 
-from cppdep import cppdep
-from cppdep.cppdep import Include
+from cppdep import cppdep, profiling
+from cppdep.cache import FileCache
+from cppdep.cppdep import Include, PatternMatcher
 
 
 def path_relpath_posix(path, root):
@@ -209,11 +217,116 @@ def test_include_neq(include_one, include_two):
      pytest.mark.xfail(('#if 0\n#include <vector>\n#endif', [])),
      pytest.mark.xfail(('/*\n#include <vector>\n*/', [])),
      pytest.mark.xfail(('#define V  <vector>\n#include V\n', ['<vector>']))])
-def test_include_grep(text, expected, tmpdir):
+@pytest.mark.parametrize('grep', [Include.grep, Include._grep_lines])
+def test_include_grep(grep, text, expected, tmpdir):
     """Tests the include directive search from a text."""
     src = tmpdir.join('include_grep')
     src.write(text)
-    assert [str(x) for x in Include.grep(str(src))] == expected
+    assert [str(x) for x in grep(str(src))] == expected
+
+
+@pytest.mark.parametrize('data', [
+    b'#include <a>\r#include <b>\r\n#include <c>\n',
+    b'#include <a>\r\n\r\n#include "b"', b'\r#include <a>\r',
+    b'\xc2\xa0#include <a>', b'\xa0#include <a>', b'#\xc2\xa0include <a>',
+    b'#include <\xc3\xa9>', b'#include <a\xc2\xa0b>', b'#include <\xff>',
+    b'\xef\xbb\xbf#include <a>', b'\x1c#include <a>', b'#include <a\x1cb>',
+    b'#include\x0b<a>', b'#include\n<a>', b'include <a>\n#include <b>',
+    b'#include <a> #include <b>', b'#include <a>\x00', b'\x00#include <a>'
+])
+def test_include_grep_engines(data, tmpdir):
+    """Tests the binary include search against the search in text mode."""
+    src = tmpdir.join('include_grep')
+    src.write_binary(data)
+    assert ([(x.include_path, x.with_quotes) for x in Include.grep(str(src))]
+            == [(x.include_path, x.with_quotes)
+                for x in Include._grep_lines(str(src))])
+
+
+@pytest.mark.parametrize('jobs', [1, 2, 4])
+def test_grep_includes(jobs, tmpdir):
+    """Tests the parallel include directive search in multiple files."""
+    texts = ['#include <a>\n#include "b"', '', '#include <c>', '#include <a>']
+    paths = []
+    for i, text in enumerate(texts):
+        src = tmpdir.join('src%d' % i)
+        src.write(text)
+        paths.append(str(src))
+    includes = cppdep.grep_includes(((x, None) for x in paths), jobs)
+    assert sorted(includes) == sorted(paths)
+    assert ([[str(x) for x in includes[path]] for path in paths] ==
+            [['<a>', '"b"'], [], ['<c>'], ['<a>']])
+
+
+def test_grep_includes_cached(tmpdir):
+    """Tests the include directive search with the results from a cache."""
+    src = tmpdir.join('src')
+    src.write('#include <a>\n#include "b"')
+    cache = FileCache(str(tmpdir.join('cache.json')), cppdep.VERSION)
+    for _ in range(2):
+        includes = cppdep.grep_includes([(str(src), None)], cache=cache)
+        assert [str(x) for x in includes[str(src)]] == ['<a>', '"b"']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_grep_includes_cache_digest(tmpdir, monkeypatch, jobs):
+    """The cache entries are put without reading the files again."""
+    paths = []
+    for name in ('a.cc', 'b.cc'):
+        src = tmpdir.join(name)
+        src.write('#include <a>\nint x;\n' + 'int y;\n' * 20000)
+        paths.append(str(src))
+    file_digest = mock.Mock(side_effect=cppdep.file_digest)
+    monkeypatch.setattr('cppdep.cache.file_digest', file_digest)
+    cache = FileCache(str(tmpdir.join('cache.json')), cppdep.VERSION)
+    limits = cppdep.ScanLimits(True, None)
+    cppdep.grep_includes(((x, limits) for x in paths), jobs, cache)
+    assert not file_digest.called
+    cache.save()
+    stat = os.stat(paths[0])
+    os.utime(paths[0], (stat.st_atime, stat.st_mtime + 10))
+    cache = FileCache(str(tmpdir.join('cache.json')), cppdep.VERSION)
+    includes = cppdep.grep_includes([(paths[0], limits)], cache=cache)
+    assert [str(x) for x in includes[paths[0]]] == ['<a>']
+    assert (cache.hits, file_digest.call_args[0]) == (1, (paths[0], 1 << 16))
+
+
+@pytest.mark.parametrize(
+    'text,limits,expected,cut_off',
+    [('#include <a>\nint x;\n#include <b>', (False, None), ['<a>', '<b>'],
+      False),
+     ('#include <a>\nint x;\n#include <b>', (True, None), ['<a>'], True),
+     ('#include <a>\nint x;\nint y;', (True, None), ['<a>'], False),
+     ('// c\n/* c\n#include <a>\n*/\n#include <b>\nint x;', (True, None),
+      ['<a>', '<b>'], False),
+     ('#define X \\\n  int\n#include <a> /* c\nint x; */\n#include <b>',
+      (True, None), ['<a>', '<b>'], False),
+     ('#ifdef __cplusplus\nextern "C" {\n#endif\n#include <a>\nint x;',
+      (True, None), ['<a>'], False),
+     ('#include <a>\n#include <b>', (True, None), ['<a>', '<b>'], False),
+     ('#include <a>\n#include <b>', (False, 16), ['<a>'], True),
+     ('#include <a>\n#include <b>', (False, 13), ['<a>'], True),
+     ('#include <a>\n#include <b>', (False, 12), [], True),
+     ('#include <a>\n#include <b>', (False, 25), ['<a>', '<b>'], False),
+     ('#include <a>\n#include <b>', (True, 16), ['<a>'], True),
+     ('// c\n' * 20000 + '#include <a>\nint x;', (True, None), ['<a>'],
+      False),
+     ('#include <a>\nint x;\n' + '// c\n' * 20000 + '#include <b>',
+      (True, None), ['<a>'], False),
+     ('#include <a>\nint x;\n' + '// c\n' * 20000, (True, 1000), ['<a>'],
+      False),
+     ('#include <a> // /*\nint x;\n#include <b>', (True, None), ['<a>'],
+      True),
+     ('#include <a> /* // */ /* c\nint x; */\n#include <b>', (True, None),
+      ['<a>', '<b>'], False)])
+def test_include_scan_limits(text, limits, expected, cut_off, tmpdir):
+    """Tests the bounded include directive search."""
+    src = tmpdir.join('include_scan')
+    src.write(text)
+    includes, hidden = Include.scan(str(src), cppdep.ScanLimits(*limits))
+    assert [str(x) for x in includes] == expected
+    assert hidden == cut_off
 
 
 @pytest.fixture()
@@ -241,7 +354,8 @@ def test_include_locate(include, cwd, include_dirs, expected, include_setup):
     tmpdir, _ = include_setup
     abs_cwd = cppdep.path_normjoin(str(tmpdir), cwd)
     include_dirs = [cppdep.path_normjoin(str(tmpdir), x) for x in include_dirs]
-    hpath, package = include.locate(abs_cwd, include_dirs, [])
+    hpath, package = include.locate(abs_cwd, include_dirs,
+                                    PatternMatcher())
     assert package is None
     assert include.hpath == hpath
     if expected is None:
@@ -251,6 +365,95 @@ def test_include_locate(include, cwd, include_dirs, expected, include_setup):
         assert path_relpath_posix(include.hpath, str(tmpdir)) == expected
 
 
+def test_include_find_interned(include_setup):
+    """Shared includes are found in different contexts without changes."""
+    tmpdir, dirs = include_setup
+    include = Include.intern('./header', True)
+    assert Include.intern('./header', True) is include
+    assert Include.intern('./header', False) is not include
+    assert Include.intern('header', True) == include
+    for cwd in dirs:
+        assert include.find(cwd, [], PatternMatcher()) == (os.path.join(
+            cwd, 'header'), None)
+    assert include.find(str(tmpdir), [], PatternMatcher()) == (None, None)
+    assert include.hpath is None
+
+
+def test_grep_includes_interned(tmpdir):
+    """The same include directives in files share the same objects."""
+    paths = []
+    for name in ('a.cc', 'b.cc'):
+        src = tmpdir.join(name)
+        src.write('#include "a.h"\n#include <vector>\n')
+        paths.append(str(src))
+    for jobs in (1, 2):
+        includes = cppdep.grep_includes(((x, None) for x in paths), jobs)
+        assert all(x is y for x, y in zip(*includes.values()))
+
+
+def test_grep_locate_fresh(tmpdir):
+    """Includes from grep are located independently of other files."""
+    paths = []
+    for name in ('a', 'b'):
+        tmpdir.join(name, 'h.h').write('', ensure=True)
+        src = tmpdir.join(name, 'src.cc')
+        src.write('#include "h.h"\n')
+        paths.append(str(src))
+    includes = [list(Include.grep(x)) for x in paths]
+    for path, (include,) in zip(paths, includes):
+        cwd = os.path.dirname(path)
+        assert include.locate(cwd, [], PatternMatcher()) == (os.path.join(
+            cwd, 'h.h'), None)
+        assert include.hpath == os.path.join(cwd, 'h.h')
+
+
+def test_path_table():
+    """Distinct paths are stored once with integer ids."""
+    paths = cppdep.PathTable()
+    path = os.path.join('dir', 'file')
+    assert paths.intern(path) is path
+    assert paths.intern(os.path.join('dir', 'file')) is path
+    assert paths.id(os.path.join('dir', 'file')) == 0
+    assert paths.id('other') == 1
+    assert paths.intern('other') == 'other'
+    assert paths.path(0) is path
+    assert paths.path(paths.id('other')) == 'other'
+    assert len(paths) == 2
+
+
+@pytest.mark.parametrize('fallback', [False, True])
+def test_directory_index(fallback, include_setup):
+    """The in-memory index of files in directories."""
+    tmpdir, dirs = include_setup
+    index = cppdep.DirectoryIndex(fallback)
+    assert index.isfile(os.path.join(dirs[0], 'header'))
+    assert not index.isfile(dirs[0])
+    assert not index.isfile(os.path.join(dirs[0], 'missing'))
+    assert not index.isfile(os.path.join(str(tmpdir), 'missing', 'header'))
+    tmpdir.join('project1', 'new_header').write('')
+    assert index.isfile(os.path.join(dirs[0], 'new_header')) == fallback
+    include = Include('header', False)
+    assert (include.locate(dirs[0], dirs, PatternMatcher(), index.isfile) ==
+            (os.path.join(dirs[-1], 'header'), None))
+
+
+@pytest.mark.skipif(platform.system() == 'Windows',
+                    reason='Names are normalized to lower case.')
+@pytest.mark.parametrize('case_sensitive', [False, True])
+def test_directory_index_case(tmpdir, monkeypatch, case_sensitive):
+    """Names in other case are checked on the filesystem."""
+    tmpdir.join('Header.h').write('')
+    index = cppdep.DirectoryIndex()
+    assert index.isfile(os.path.join(str(tmpdir), 'Header.h'))
+    isfile = mock.Mock(return_value=not case_sensitive)
+    monkeypatch.setattr(os.path, 'isfile', isfile)
+    path = os.path.join(str(tmpdir), 'header.h')
+    assert index.isfile(path) != case_sensitive
+    isfile.assert_called_once_with(path)
+    assert not index.isfile(os.path.join(str(tmpdir), 'other.h'))
+    assert isfile.call_count == 1
+
+
 @pytest.mark.parametrize(
     'include,cwd,include_patterns,expected',
     [(Include('header_foo', True), '.', [], (None, None)),
@@ -272,10 +475,30 @@ def test_include_locate_pattern(include, cwd, include_patterns, expected,
     """Pattern based include header location."""
     tmpdir, include_dirs = include_setup
     abs_cwd = cppdep.path_normjoin(str(tmpdir), cwd)
-    include_patterns = [(x, [re.compile(y)]) for x, y in include_patterns]
+    include_patterns = PatternMatcher((x, [y]) for x, y in include_patterns)
     assert include.locate(abs_cwd, include_dirs, include_patterns) == expected
 
 
+@pytest.mark.parametrize('hfile,expected', [
+    ('header', None), ('foo/a.h', 'foo'), ('foo/b.hpp', 'foo'),
+    ('bar/a.h', 'bar'), ('foo_bar/a.h', 'bar'), ('baz/x/x.h', 'baz'),
+    ('baz/x/y.h', None), ('QUX/a.h', 'qux'), ('qux/a.h', 'qux'),
+    ('group/1/a.h', 'group'), ('last.h', 'last')
+])
+@pytest.mark.parametrize('num_filler', [0, 1, 200])
+def test_pattern_matcher(hfile, expected, num_filler):
+    """The first package with a matching pattern is found."""
+    filler = [('filler%d' % i, [r'filler%d/(\w)(\w)' % i])
+              for i in range(num_filler)]
+    include_patterns = filler[:num_filler // 2] + [
+        ('empty', []), ('foo', [r'foo/\w+\.h$', r'foo/\w+\.hpp$']),
+        ('bar', [r'(?P<_p0>foo_)?bar/']), ('baz', [r'baz/(\w)/\1\.h']),
+        ('qux', [r'(?i)qux/']), ('group', [r'(group)/(\d)/(?(2)a|b)\.h']),
+        ('foo_bar', ['foo_bar/'])
+    ] + filler[num_filler // 2:] + [('last', ['last', 'foo'])]
+    assert PatternMatcher(include_patterns).match(hfile) == expected
+
+
 @pytest.mark.parametrize('hpath,cpath',
                          [('header', None), (None, 'source'),
                           ('header', 'source')])
@@ -304,6 +527,146 @@ def test_component_init(hpath, cpath, tmpdir, monkeypatch):
     assert hpath or mock_warn.called
 
 
+@pytest.mark.parametrize('path,patterns', [
+    ('/a/b.h', []), ('/a/b.h', ['/a/*']), ('/a/b.h', ['/a/c*', '/a/b.?']),
+    ('/a/b/c.h', ['/a/*.h']), ('/a/b.h', ['/a/[!b].h']), ('/a/b.h', ['/a']),
+    ('/a/b.h', ['/a/b.h?']), ('/a/b.h\n', ['/a/b.h']), ('/a.b', ['/a?b'])
+])
+def test_compile_globs(path, patterns):
+    """Compiled globs match the same paths as fnmatch."""
+    regex = cppdep.compile_globs(patterns)
+    assert (bool(regex and regex.match(os.path.normcase(path))) == any(
+        fnmatch.fnmatch(path, x) for x in patterns))
+
+
+@pytest.fixture()
+def src_tree(tmpdir):
+    """Sets up a directory tree with source files."""
+    for path in ('a.h', 'a.cc', 'lib/b.h', 'lib/sub/c.h', 'lib/sub/c.cc',
+                 'build/d.h', 'build/gen/e.h', 'test/f.cc', 'x/y/z/g.h'):
+        tmpdir.join(*path.split('/')).write('', ensure=True)
+    return tmpdir
+
+
+@pytest.mark.parametrize('use_scandir', [True, False])
+def test_walk_files(src_tree, use_scandir, monkeypatch):
+    """The files are walked in the same order as with os.walk."""
+    if not use_scandir:
+        monkeypatch.setattr(cppdep, '_scandir', None)
+    root = str(src_tree)
+    if platform.system() != 'Windows':
+        os.symlink(os.path.join(root, 'lib'), os.path.join(root, 'lib_link'))
+        os.symlink(os.path.join(root, 'a.h'), os.path.join(root, 'h_link.h'))
+    assert list(cppdep.walk_files(root)) == [
+        os.path.join(dir_path, x)
+        for dir_path, _, files in os.walk(root)
+        for x in files
+    ]
+
+
+def test_walk_files_ignore(src_tree):
+    """Ignored directories are not traversed."""
+    root = str(src_tree)
+    ignore_regex = cppdep.compile_globs(
+        os.path.join(root, x) for x in ('build', '*.cc', 'x/y'))
+    assert sorted(
+        os.path.relpath(x, root)
+        for x in cppdep.walk_files(root, ignore_regex)) == sorted(
+            os.path.join(*x.split('/'))
+            for x in ('a.h', 'lib/b.h', 'lib/sub/c.h'))
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_package_find_component_files(src_tree, jobs):
+    """Components are found in source paths without ignored paths."""
+    group = mock.MagicMock(path=str(src_tree))
+    package = cppdep.Package('pkg', group, ['a.*', 'lib', 'test', 'x'], [],
+                             [], [], ['lib/sub', 'test', 'x/y'])
+    root = str(src_tree)
+    assert sorted(
+        (os.path.relpath(x, root), y and os.path.relpath(y, root))
+        for x, y in package.find_component_files(jobs)) == [
+            ('a.h', 'a.cc'), (os.path.join('lib', 'b.h'), None)
+        ]
+
+
+_File = collections.namedtuple('File', ['rev_path', 'path'])
+
+
+def _make_file(path):
+    """Returns the file tuple as in the package source file traversal."""
+    rev_path = cppdep.strip_ext(path).split('/')
+    rev_path.reverse()
+    return _File(rev_path, path)
+
+
+def _pair_files_quadratic(hfiles, cfiles):
+    """The reference pairing with all the header candidates per c file."""
+
+    def _num_consecutive_ancestors(file_one, file_two):
+        return sum(1 for _ in itertools.takewhile(
+            lambda x: x[0] == x[1], zip(file_one.rev_path, file_two.rev_path)))
+
+    hfiles = list(hfiles)
+    candidates = [(x,
+                   sorted(((_num_consecutive_ancestors(x, y), y)
+                           for y in hfiles),
+                          reverse=True)) for x in cfiles]
+    candidates.sort(reverse=True, key=lambda x: tuple(y for y, _ in x[1]))
+    for cfile, hfile_candidates in candidates:
+        for _, hfile in hfile_candidates:
+            if hfile in hfiles:
+                yield hfile.path, cfile.path
+                hfiles.remove(hfile)
+                break
+        else:
+            yield None, cfile.path
+    for hfile in hfiles:
+        yield hfile.path, None
+
+
+def _pair_files(hfiles, cfiles):
+    """Pairs the files with the same name with the package algorithm."""
+    # pylint: disable=protected-access
+    return list(cppdep.Package._Package__pair_files({
+        'name': hfiles
+    }, {
+        'name': cfiles
+    }))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_package_pair_files(seed):
+    """Files are paired as with the comparison of all the candidates."""
+    rand = random.Random(seed)
+    dirs = ['a', 'b', 'c', 'include', 'src']
+
+    def _random_files(extensions):
+        return [
+            _make_file('/'.join(
+                [''] + [rand.choice(dirs) for _ in range(rand.randint(0, 4))] +
+                ['name' + rand.choice(extensions)]))
+            for _ in range(rand.randint(1, 12))
+        ]
+
+    hfiles = _random_files(['.h', '.hpp'])
+    cfiles = _random_files(['.cc', '.cpp'])
+    assert _pair_files(hfiles, cfiles) == list(
+        _pair_files_quadratic(hfiles, cfiles))
+
+
+def test_package_pair_files_stress():
+    """Thousands of files with the same name are paired by directories."""
+    paths = ['/root/mod%d/sub%d/utils' % (i % 50, i) for i in range(5000)]
+    hfiles = [_make_file(x + '.h') for x in paths]
+    cfiles = [_make_file(x + '.cc') for x in reversed(paths)]
+    cfiles.append(_make_file('/root/extra/utils.cc'))
+    pairs = _pair_files(hfiles, cfiles)
+    assert len(pairs) == 5001
+    assert (None, '/root/extra/utils.cc') in pairs
+    assert all(x is None or x[:-2] == y[:-3] for x, y in pairs)
+
+
 @pytest.mark.parametrize('filename,is_header',
                          [('', None), ('.file', None), ('header', True),
                           ('head.er', None), ('header.h', True),
@@ -323,3 +686,294 @@ def test_package_src_regex(filename, is_header):
         assert src_match.group('h') is not None
     else:
         assert src_match.group('c') is not None
+
+
+_PROJECT_CONFIG = """
+internal:
+    - name: project
+      path: %(root)s/src
+      packages:
+          - name: pkg
+            src: [pkg]
+            include: [.]
+          - name: pkg2
+            src: [pkg2]
+external:
+    - name: external
+      path: %(root)s/ext
+      packages:
+          - name: ext
+            include: [include]
+"""
+
+
+@pytest.fixture()
+def project(tmpdir):
+    """Sets up a small project and returns its configuration file path."""
+    sources = {
+        'src/pkg/a.h': '#include "b.h"\n#include <ext.h>\n#include <missing.h>',
+        'src/pkg/a.cc': '#include "a.h"\n#include <ext.h>',
+        'src/pkg/b.h': '#include <ext.h>\n#include <missing.h>',
+        'src/pkg2/c.h': '#include "pkg/a.h"',
+        'ext/include/ext.h': ''
+    }
+    for path, text in sources.items():
+        tmpdir.join(*path.split('/')).write(text, ensure=True)
+    config = tmpdir.join('.cppdep.yml')
+    config.write(_PROJECT_CONFIG % {'root': str(tmpdir)})
+    return str(config)
+
+
+def test_analysis_locate(project):
+    """Include directives are located once in the same context."""
+    analysis = cppdep.DependencyAnalysis(project)
+    assert (analysis.locate_misses, analysis.locate_hits) == (5, 2)
+    components = dict((str(x), x) for x in analysis.internal_components)
+    assert sorted(components) == ['a', 'b', 'c']
+    ext_hpath = os.path.join(os.path.dirname(project), 'ext', 'include',
+                             'ext.h')
+    assert components['a'].dependencies() == set(
+        [components['b'], analysis._external_components[ext_hpath]])
+    assert components['c'].dependencies() == set([components['a']])
+
+
+def test_analysis_release_includes(project):
+    """Include directives are dropped after the location on request."""
+    analysis = cppdep.DependencyAnalysis(project)
+    released = cppdep.DependencyAnalysis(project, release_includes=True)
+
+    def _dependencies(components):
+        return dict((str(x), sorted(y.hpath for y in x.dependencies()))
+                    for x in components)
+
+    assert (_dependencies(released.internal_components) ==
+            _dependencies(analysis.internal_components))
+    assert released.paths is None
+    for component in analysis.internal_components:
+        assert analysis.paths.intern(component.working_dir) is (
+            component.working_dir)
+    for component in released.internal_components:
+        assert not hasattr(component, '__dict__')
+        assert component.includes_in_h is None
+        assert component.includes_in_c is None
+    assert all(x.includes_in_h is not None
+               for x in analysis.internal_components)
+
+
+def test_analysis_quotient_dependencies(project):
+    """Dependencies are aggregated into packages and groups."""
+    analysis = cppdep.DependencyAnalysis(project)
+    component_edges, package_edges, group_edges = (
+        analysis.quotient_dependencies())
+
+    def _names(edges):
+        return sorted((str(x), str(y)) for x, y in edges)
+
+    group = analysis.internal_groups['project']
+    assert sorted(str(x) for x in component_edges) == ['pkg', 'pkg2']
+    assert _names(component_edges[group.packages['pkg']]) == [('a', 'b'),
+                                                              ('a', 'ext'),
+                                                              ('b', 'ext')]
+    assert _names(component_edges[group.packages['pkg2']]) == [('c', 'pkg')]
+    assert _names(package_edges[group]) == [('pkg', 'external'),
+                                            ('pkg2', 'pkg')]
+    assert _names(group_edges) == [('project', 'external')]
+
+
+@pytest.mark.parametrize('report_format', ['text', 'jsonl'])
+def test_analysis_jobs(project, tmpdir, monkeypatch, report_format):
+    """Parallel analysis reports are the same as serial ones."""
+    reports = []
+    for jobs in (1, 2):
+        output_dir = tmpdir.join(report_format, str(jobs)).ensure(dir=True)
+        monkeypatch.chdir(output_dir)
+        report = []
+        cppdep.DependencyAnalysis(project, jobs).analyze(
+            lambda *x: report.append(x), argparse.Namespace(
+                l=True,
+                L=False,
+                format=report_format,
+                graph_format=['dot'],
+                dot_ranks=False,
+                dot_clusters=False))
+        reports.append((report, dict((x.basename, sorted(x.readlines()))
+                                     for x in output_dir.listdir())))
+    assert reports[0] == reports[1]
+    assert sorted(reports[0][1]) == [
+        'project.dot', 'project_pkg.dot', 'project_pkg2.dot'
+    ]
+    assert cppdep._worker_jobs is None  # Only the workers keep the jobs.
+
+
+def test_analysis_default_options(project, tmpdir, monkeypatch):
+    """The report options missing in the arguments have the CLI defaults."""
+    monkeypatch.chdir(tmpdir)
+    report = []
+    cppdep.DependencyAnalysis(project).analyze(
+        lambda *x: report.append(x), argparse.Namespace(l=False, L=False))
+    assert ('\n' + '#' * 80,) in report
+    assert sorted(x.basename for x in tmpdir.listdir('*.dot')) == [
+        'project.dot', 'project_pkg.dot', 'project_pkg2.dot'
+    ]
+
+
+def test_analysis_jsonl(project, tmpdir, monkeypatch):
+    """The report has a JSON record per graph on a line."""
+    monkeypatch.chdir(tmpdir)
+    report = []
+    cppdep.DependencyAnalysis(project).analyze(
+        report.append,
+        argparse.Namespace(
+            l=False,
+            L=False,
+            format='jsonl',
+            graph_format=['dot'],
+            dot_ranks=False,
+            dot_clusters=False))
+    records = sorted((json.loads(x) for x in report), key=lambda x: x['graph'])
+    assert [x['graph'] for x in records] == [
+        'project', 'project_pkg', 'project_pkg2'
+    ]
+    assert records[0]['edges'] == [['pkg', 'external'], ['pkg2', 'pkg']]
+    assert [x['name'] for x in records[1]['nodes']] == ['ext', 'b', 'a']
+    assert records[2]['summary']['components'] == 1
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_analysis_profile(project, tmpdir, monkeypatch, jobs):
+    """The phases and counters of the analysis are profiled."""
+    monkeypatch.chdir(tmpdir)
+    profile = profiling.enable()
+    try:
+        cppdep.DependencyAnalysis(project, jobs).analyze(
+            lambda *x: None, argparse.Namespace(
+                l=False,
+                L=False,
+                format='text',
+                graph_format=['dot'],
+                dot_ranks=False,
+                dot_clusters=False))
+    finally:
+        assert profiling.disable() is profile
+    assert list(profile.phases) == [
+        'config', 'setup', 'discover', 'scan', 'construct', 'locate',
+        'quotient', 'graph', 'scc', 'condense', 'reduce', 'report', 'dot'
+    ]
+    assert profile.phases['scc'][1] == 3
+    counters = profile.counters
+    assert (counters['components'], counters['files scanned']) == (3, 4)
+    assert counters['bytes read'] == sum(
+        len(tmpdir.join('src', x).read_binary())
+        for x in ('pkg/a.h', 'pkg/a.cc', 'pkg/b.h', 'pkg2/c.h'))
+    assert (counters['include resolutions'],
+            counters['resolution cache hits']) == (5, 2)
+    assert (counters['graphs'], counters['graph nodes']) == (3, 8)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_analysis_trace(project, tmpdir, monkeypatch, jobs):
+    """Spans of files, components, and graphs are traced."""
+    monkeypatch.chdir(tmpdir)
+    trace = profiling.enable_trace()
+    try:
+        cppdep.DependencyAnalysis(project, jobs).analyze(
+            lambda *x: None, argparse.Namespace(
+                l=False,
+                L=False,
+                format='text',
+                graph_format=['dot'],
+                dot_ranks=False,
+                dot_clusters=False))
+    finally:
+        assert profiling.disable_trace() is trace
+    spans = collections.defaultdict(list)
+    for event in trace.events:
+        spans[event['cat']].append(event['name'])
+    src = str(tmpdir.join('src'))
+    assert sorted(spans['scan']) == sorted(
+        os.path.join(src, *x.split('/'))
+        for x in ('pkg/a.h', 'pkg/a.cc', 'pkg/b.h', 'pkg2/c.h'))
+    assert sorted(spans['discover']) == ['project.pkg', 'project.pkg2']
+    assert sorted(spans['construct']) == ['project.pkg', 'project.pkg2']
+    assert len(spans['component']) == len(spans['locate']) == 3
+    assert sorted(spans['analyze']) == ['project', 'project_pkg',
+                                        'project_pkg2']
+    assert 'reduce' in spans['phase']
+
+
+@pytest.mark.parametrize('header,package', [('ext.h', 'ext'),
+                                            ('sub/sub.h', 'sub'),
+                                            ('subway/way.h', 'ext'),
+                                            ('sub/deep/deep.h', 'deep')])
+def test_analysis_external_alias(project, tmpdir, header, package):
+    """The most specific alias associates headers to external packages."""
+    root = os.path.dirname(project)
+    with open(project, 'a') as config:
+        config.write("""
+          - name: sub
+            include: [include/sub]
+          - name: deep
+            include: [include/sub/deep]
+""")
+    tmpdir.join('ext', 'include', 'sub', 'deep').ensure(dir=True)
+    tmpdir.join('ext', 'include', *header.split('/')).write('', ensure=True)
+    tmpdir.join('src', 'pkg', 'a.cc').write('#include <%s>' % header)
+    analysis = cppdep.DependencyAnalysis(project)
+    hpath = os.path.join(root, 'ext', 'include', *header.split('/'))
+    assert analysis._external_components[hpath].package.name == package
+
+
+def test_analysis_ambiguous_alias(project):
+    """Aliases are unique among external packages."""
+    with open(project, 'a') as config:
+        config.write("""
+          - name: dup
+            include: [include]
+""")
+    with pytest.raises(AssertionError):
+        cppdep.DependencyAnalysis(project)
+
+
+@pytest.mark.parametrize('text,error', [
+    ('internal: [', cppdep.MalformedConfigError),
+    ('internal: {}', cppdep.InvalidConfigError),
+])
+def test_load_config_errors(tmpdir, text, error):
+    """Errors of the configuration libraries are reported as cppdep errors."""
+    config_file = tmpdir.join('.cppdep.yml')
+    config_file.write(text)
+    with pytest.raises(error):
+        cppdep.load_config(str(config_file))
+
+
+def test_analysis_config_cache(project, tmpdir, monkeypatch):
+    """The validated configuration is loaded from the cache directory."""
+    cache_dir = str(tmpdir.join('cache'))
+    config = cppdep.DependencyAnalysis(project, cache_dir=cache_dir).config
+    load_config = mock.Mock(side_effect=cppdep.load_config)
+    monkeypatch.setattr(cppdep, 'load_config', load_config)
+    assert cppdep.DependencyAnalysis(project, cache_dir=cache_dir).config == (
+        config)
+    assert not load_config.called
+    with open(project, 'a') as config_file:
+        config_file.write('\n# Modified\n')
+    assert cppdep.DependencyAnalysis(project, cache_dir=cache_dir).config == (
+        config)
+    assert load_config.call_count == 1
+
+
+def test_startup_imports():
+    """Heavy modules are not imported until needed."""
+    heavy_modules = [
+        'networkx', 'pydot', 'yaml', 'pykwalify', 'multiprocessing'
+    ]
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(cppdep.__file__))
+    output = subprocess.check_output(
+        [
+            sys.executable, '-c',
+            'import sys; import cppdep.__main__; '
+            'print(sorted(x for x in %r if x in sys.modules))' % heavy_modules
+        ],
+        env=env)
+    assert output.decode().strip() == '[]'
@@ -18,9 +18,12 @@
 
 from __future__ import print_function, absolute_import
 
+import random
+
+import networkx as nx
 import pytest
 
-from cppdep import graph
+from cppdep import graph, npz
 
 #pylint: disable=redefined-outer-name
 
@@ -28,19 +31,18 @@ from cppdep import graph
 def small_graph():
     """A small dependency graph with multiple cycles."""
     dependency_graph = graph.Graph([])
-    digraph = dependency_graph.digraph
     edges1 = [(1, 2), (2, 4), (2, 6), (6, 2), (6, 7), (7, 6)]
     edges2 = [(1, 3), (1, 5), (3, 4), (3, 5), (3, 8), (8, 9), (9, 3)]
     edges3 = [(10, 11), (10, 12), (11, 12), (12, 11)]
-    digraph.add_edges_from(edges1)
-    digraph.add_edges_from(edges2)
-    digraph.add_edges_from(edges3)
+    dependency_graph.add_edges_from(edges1)
+    dependency_graph.add_edges_from(edges2)
+    dependency_graph.add_edges_from(edges3)
     return dependency_graph
 
 
 def test_graph_init(small_graph):
     """Test the graph creation."""
-    digraph = small_graph.digraph
+    digraph = small_graph.to_networkx()
     assert set(digraph) == set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12])
     assert set(digraph.edges()) == set([(1, 2), (1, 3), (1, 5), (10, 11),
                                         (10, 12), (11, 12), (12, 11), (2, 4),
@@ -57,7 +59,7 @@ def dep_graph(small_graph):
 
 def test_graph_minimal(dep_graph):
     """Test the graph after minimization."""
-    digraph = dep_graph.digraph
+    digraph = dep_graph.to_networkx()
     assert set(digraph) == set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12])
     assert set(digraph.edges()) == set([(1, 2), (1, 3), (10, 11),
                                         (10, 12), (11, 12), (12, 11), (2, 4),
@@ -132,3 +134,197 @@ def test_print_summary(dep_graph, capsys):
                                'Components: 12\t Cycles: 3\t Levels: 5',
                                'CCD: 45\t ACCD: 3.75\t NCCD: 1.25 '
                                '(typical range is [0.85, 1.10])', '']
+
+
+def _random_dag(seed, num_nodes=60, num_edges=300):
+    """Returns edges of a random acyclic graph."""
+    rand = random.Random(seed)
+    edges = set()
+    for _ in range(num_edges):
+        u, v = rand.sample(range(num_nodes), 2)
+        edges.add((min(u, v), max(u, v)))
+    return sorted(edges)
+
+
+def _transitive_reduction_dfs(digraph):
+    """The reference reduction with a search from every successor."""
+    for u in digraph:
+        transitive_vertex = []
+        for v in digraph[u]:
+            transitive_vertex.extend(x for _, x in nx.dfs_edges(digraph, v))
+        digraph.remove_edges_from((u, x) for x in transitive_vertex)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_graph_transitive_reduction(seed):
+    """The reduction of acyclic graphs keeps only non-redundant edges."""
+    dependency_graph = graph.Graph([])
+    dependency_graph.add_edges_from(_random_dag(seed))
+    reference = dependency_graph.to_networkx()
+    _transitive_reduction_dfs(reference)
+    dependency_graph.analyze()
+    assert (set(dependency_graph.to_networkx().edges()) ==
+            set(reference.edges()))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_graph_ccd(seed):
+    """The CD of nodes is the size of their closures of dependencies."""
+    rand = random.Random(seed)
+    edges = [tuple(rand.sample(range(40), 2)) for _ in range(60)]
+    dependency_graph = graph.Graph([])
+    dependency_graph.add_edges_from(edges)
+    reference = dependency_graph.to_networkx()
+    dependency_graph.analyze()
+    for node, cd in dependency_graph.node2cd.items():
+        if node in dependency_graph.cycles:
+            node = next(iter(node))
+        assert cd == len(nx.descendants(reference, node) | set([node]))
+
+
+def test_graph_deep_chain():
+    """Metrics are calculated without recursion for deep dependencies."""
+    depth = 100000
+    dependency_graph = graph.Graph([])
+    dependency_graph.add_edges_from(
+        (i, i + 1) for i in range(depth - 1))
+    dependency_graph.add_edges_from([(depth - 1, depth),
+                                     (depth, depth - 1), (0, 2)])
+    dependency_graph.analyze()
+    assert dependency_graph.to_networkx().number_of_edges() == depth + 1
+    assert dependency_graph.get_level(0) == depth + 1
+    assert dependency_graph.get_level(depth) == 2
+    assert dependency_graph.node2cd[0] == depth + 1
+    assert sum(dependency_graph.node2cd.values()) == (
+        (depth - 1) * (depth + 4) // 2 + 2)
+
+
+def test_graph_isolated_cycle(capsys):
+    """Cycles without dependencies outside of them are analyzed."""
+    dependency_graph = graph.Graph([])
+    dependency_graph.add_edges_from([(1, 2), (2, 1)])
+    dependency_graph.analyze()
+    assert (set(dependency_graph.to_networkx().edges()) ==
+            set([(1, 2), (2, 1)]))
+    dependency_graph.print_summary(print)
+    out, _ = capsys.readouterr()
+    assert 'Components: 2\t Cycles: 1\t Levels: 2' in out
+
+
+def test_graph_record(dep_graph):
+    """Test the analysis results as a record."""
+    record = dep_graph.to_record('graph')
+    assert record['graph'] == 'graph'
+    assert record['summary'] == dep_graph.summary()
+    assert record['summary']['components'] == 12
+    assert [(x['name'], x['level'], x['cycle']) for x in record['nodes']] == [
+        ('4', 1, None), ('5', 1, None), ('11', 2, 0), ('12', 2, 0),
+        ('10', 3, None), ('2', 4, 1), ('3', 4, 2), ('6', 4, 1), ('7', 4, 1),
+        ('8', 4, 2), ('9', 4, 2), ('1', 5, None)
+    ]
+    assert record['cycles'][0] == {
+        'index': 0,
+        'nodes': ['11', '12'],
+        'edges': [['11', '12'], ['12', '11']]
+    }
+    assert ['1', '5'] in record['unreduced_edges']
+    assert ['1', '5'] not in record['edges']
+    assert len(record['edges']) == len(record['unreduced_edges']) - 1
+
+
+def test_graph_npz(dep_graph, tmpdir):
+    """The analyzed graph is stored in columns and edge lists."""
+    dep_graph.write_npz(str(tmpdir.join('graph')))
+    arrays = dict((x, y[0]) for x, y in npz.read_npz(
+        str(tmpdir.join('graph.npz'))).items())
+    record = dep_graph.to_record('graph')
+    names = [x.decode() for x in arrays['names']]
+    nodes = [{
+        'name': name,
+        'level': level,
+        'cd': cd,
+        'cycle': None if cycle < 0 else cycle,
+        'external': bool(external)
+    } for name, level, cd, cycle, external in zip(
+        names, arrays['levels'], arrays['cds'], arrays['cycles'],
+        arrays['external'])]
+    nodes.sort(key=lambda x: (x['level'], x['name']))
+    assert nodes == record['nodes']
+
+    def _edges(flat_edges):
+        return sorted([names[flat_edges[i]], names[flat_edges[i + 1]]]
+                      for i in range(0, len(flat_edges), 2))
+
+    assert _edges(arrays['edges']) == record['edges']
+    assert _edges(arrays['unreduced_edges']) == record['unreduced_edges']
+
+
+@pytest.mark.parametrize('name,expected', [('a', 'a'), ('_a1', '_a1'),
+                                           ('15', '15'), ('-1.5', '-1.5'),
+                                           ('1a', '"1a"'),
+                                           ('a/util', '"a/util"'),
+                                           ('a:b', '"a:b"'), ('a,b', '"a,b"'),
+                                           ('node', '"node"'),
+                                           ('Graph', '"Graph"'),
+                                           ('"a"', r'"\"a\""'),
+                                           ('a\\b', r'"a\b"'),
+                                           ('C:\\src\\a.h', r'"C:\src\a.h"'),
+                                           ('a\nb\r', r'"a\nb\r"')])
+def test_dot_id(name, expected):
+    """Test quoting of names in DOT."""
+    assert graph.dot_id(name) == expected
+
+
+def _dot_statements(dot_file):
+    """Returns the type, node IDs, and edges of the parsed DOT file."""
+    pydot = pytest.importorskip('pydot')
+    dot_graph, = pydot.graph_from_dot_file(str(dot_file))
+    return (dot_graph.get_type(),
+            sorted(x.get_name() for x in dot_graph.get_nodes()),
+            sorted((x.get_source(), x.get_destination())
+                   for x in dot_graph.get_edges()))
+
+
+def test_write_dot(dep_graph, tmpdir):
+    """The DOT file has the same statements as the one exported with pydot."""
+    nx_pydot = pytest.importorskip('networkx.drawing.nx_pydot')
+    nx_pydot.write_dot(dep_graph.to_networkx(),
+                       str(tmpdir.join('pydot.dot')))
+    dep_graph.write_dot(str(tmpdir.join('native')))
+    assert tmpdir.join('native.dot').readlines()[0] == 'strict digraph {\n'
+    assert _dot_statements(tmpdir.join('native.dot')) == _dot_statements(
+        tmpdir.join('pydot.dot'))
+
+
+def test_write_dot_paths(tmpdir):
+    """Backslashes in paths are written as is like with pydot."""
+    dependency_graph = graph.Graph([])
+    dependency_graph.add_edges_from([('C:\\src\\a.h', 'C:\\src\\b.h'),
+                                     ('C:\\src\\b.h', 'd"e')])
+    dependency_graph.analyze()
+    dependency_graph.write_dot(str(tmpdir.join('native')))
+    assert '"C:\\src\\a.h" -> "C:\\src\\b.h";\n' in tmpdir.join(
+        'native.dot').readlines()
+    assert _dot_statements(tmpdir.join('native.dot')) == (
+        'digraph', ['"C:\\src\\a.h"', '"C:\\src\\b.h"', '"d\\"e"'],
+        [('"C:\\src\\a.h"', '"C:\\src\\b.h"'),
+         ('"C:\\src\\b.h"', '"d\\"e"')])
+
+
+def test_write_dot_ranks_clusters(dep_graph, tmpdir):
+    """Levels and cycles are grouped into subgraphs on demand."""
+    dep_graph.write_dot(str(tmpdir.join('graph')), ranks=True, clusters=True)
+    subgraphs = []
+    for line in tmpdir.join('graph.dot').readlines(cr=False)[1:-1]:
+        if line.endswith('{'):
+            subgraphs.append((line, []))
+        elif subgraphs and subgraphs[-1][1][-1:] != ['}']:
+            subgraphs[-1][1].append(line)
+    assert sorted((x, sorted(y)) for x, y in subgraphs) == [
+        ('subgraph cluster_0 {', ['11;', '12;', 'rank=same;', '}']),
+        ('subgraph cluster_1 {', ['2;', '6;', '7;', 'rank=same;', '}']),
+        ('subgraph cluster_2 {', ['3;', '8;', '9;', 'rank=same;', '}']),
+        ('{', ['10;', 'rank=same;', '}']),
+        ('{', ['1;', 'rank=same;', '}']),
+        ('{', ['4;', '5;', 'rank=same;', '}']),
+    ]
@@ -0,0 +1,64 @@
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the NumPy .npz archives without NumPy."""
+
+from __future__ import absolute_import
+
+import array
+
+import pytest
+
+from cppdep.npz import read_npz, write_npz
+
+#pylint: disable=redefined-outer-name
+
+@pytest.fixture()
+def npz_file(tmpdir):
+    """Writes arrays of all supported types into an .npz file."""
+    file_path = str(tmpdir.join('arrays.npz'))
+    write_npz(file_path, [('ints', array.array('i', [1, -2, 3])),
+                          ('longs', array.array('l', [1 << 31, 0])),
+                          ('bools', bytearray([1, 0, 1])),
+                          ('names', [b'a', b'', b'abc']),
+                          ('pairs', array.array('i', [0, 1, 1, 2]), 2),
+                          ('empty', array.array('i'), 2),
+                          ('no_names', [])])
+    return file_path
+
+
+def test_npz_round_trip(npz_file):
+    """Arrays are read back with their shapes."""
+    arrays = read_npz(npz_file)
+    assert arrays['ints'] == (array.array('i', [1, -2, 3]), (3,))
+    assert list(arrays['longs'][0]) == [1 << 31, 0]
+    assert arrays['bools'] == (bytearray([1, 0, 1]), (3,))
+    assert arrays['names'] == ([b'a', b'', b'abc'], (3,))
+    assert arrays['pairs'] == (array.array('i', [0, 1, 1, 2]), (2, 2))
+    assert arrays['empty'] == (array.array('i'), (0, 2))
+    assert arrays['no_names'] == ([], (0,))
+
+
+def test_npz_numpy(npz_file):
+    """Arrays are loaded with NumPy."""
+    numpy = pytest.importorskip('numpy')
+    arrays = numpy.load(npz_file)
+    assert arrays['ints'].tolist() == [1, -2, 3]
+    assert arrays['longs'].tolist() == [1 << 31, 0]
+    assert arrays['bools'].tolist() == [True, False, True]
+    assert arrays['names'].tolist() == [b'a', b'', b'abc']
+    assert arrays['pairs'].tolist() == [[0, 1], [1, 2]]
+    assert arrays['empty'].shape == (0, 2)
+    assert arrays['no_names'].shape == (0,)
@@ -0,0 +1,114 @@
+# Copyright (C) 2017 Olzhas Rakhimov
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the times and counters of the analysis phases."""
+
+from __future__ import absolute_import
+
+import json
+
+import pytest
+
+from cppdep import profiling
+
+#pylint: disable=redefined-outer-name
+
+@pytest.fixture()
+def profile():
+    """Activates a new profile for the test."""
+    yield profiling.enable()
+    profiling.disable()
+
+
+def test_profile_disabled():
+    """Nothing is recorded without the active profile."""
+    assert profiling.active() is None
+    with profiling.phase('phase'):
+        profiling.count('counter')
+    assert profiling.disable() is None
+
+
+def test_profile_records(profile):
+    """Phases and counters are accumulated in the order of first records."""
+    for _ in range(2):
+        with profiling.phase('b'):
+            profiling.count('y', 2)
+        with profiling.phase('a'):
+            profiling.count('x')
+    assert [(x, y[1]) for x, y in profile.phases.items()] == [
+        ('b', 2), ('a', 2)
+    ]
+    assert list(profile.counters.items()) == [('y', 4), ('x', 2)]
+    assert all(x >= 0 for x, _ in profile.phases.values())
+
+
+def test_profile_merge(profile):
+    """Profiles of worker processes are merged into the active profile."""
+    profile.add_time('a', 1.0)
+    profile.count('x')
+    profile.merge({
+        'phases': [{'name': 'a', 'seconds': 2.0, 'calls': 3}],
+        'counters': [{'name': 'x', 'value': 4}, {'name': 'y', 'value': 1}]
+    })
+    assert profile.phases == {'a': [3.0, 4]}
+    assert profile.counters == {'x': 5, 'y': 1}
+    report = []
+    profile.print_table(report.append)
+    assert [x.split()[0] for x in report if x] == [
+        'phase', 'a', 'total', 'counter', 'x', 'y'
+    ]
+
+
+def test_trace(tmpdir):
+    """Spans and phases are written as complete trace events."""
+    assert profiling.span('scan', 'a.cc') is profiling.phase('scan')
+    trace = profiling.enable_trace()
+    try:
+        with profiling.phase('scan'):
+            with profiling.span('scan', 'a.cc'):
+                pass
+    finally:
+        assert profiling.disable_trace() is trace
+    trace_file = str(tmpdir.join('trace.json'))
+    trace.write(trace_file)
+    with open(trace_file) as json_file:
+        events = json.load(json_file)['traceEvents']
+    assert [(x['cat'], x['name'], x['ph']) for x in events] == [
+        ('scan', 'a.cc', 'X'), ('phase', 'scan', 'X')
+    ]
+    assert events[1]['ts'] <= events[0]['ts']
+    assert (events[0]['ts'] + events[0]['dur'] <=
+            events[1]['ts'] + events[1]['dur'])
+
+
+def test_trace_rounding():
+    """Nested spans end within the parent span after rounding."""
+    trace = profiling.Trace()
+    trace.add('phase', 'scan', 100.0000019, 100.0000035)
+    trace.add('scan', 'a.cc', 100.0000020, 100.0000035)
+    parent, child = trace.events
+    assert parent['ts'] + parent['dur'] == child['ts'] + child['dur']
+
+
+def test_trace_profile(profile):
+    """Phases are recorded in the profile and the trace."""
+    trace = profiling.enable_trace()
+    try:
+        with profiling.phase('scan'):
+            pass
+    finally:
+        profiling.disable_trace()
+    assert [x['name'] for x in trace.events] == ['scan']
+    assert list(profile.phases) == ['scan']